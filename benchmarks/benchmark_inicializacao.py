@@ -0,0 +1,107 @@
+"""
+Tempo de inicialização a frio de cada página.
+
+Cada medição roda num processo novo: importa o Streamlit, executa o script
+da página uma vez pelo ``AppTest`` (com os valores padrão dos widgets) e
+para quando a primeira renderização termina. Os dados sintéticos são
+gerados e ingeridos antes, então o que se mede é o custo de importações e
+da primeira pintura, não o de download. Também é registrado se pandas,
+plotly.express e requests chegaram a ser importados.
+
+Uso:
+    python -m benchmarks.benchmark_inicializacao [--repeticoes 3] [--saida atual.json]
+                                                 [--comparar base.json] [--tolerancia 0.25]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.benchmark_paginas import regressoes
+from benchmarks.processos import executar_em_processo
+
+RAIZ = Path(__file__).resolve().parent.parent
+PAGINAS = [
+    'gerar_dados_dos_candidatos.py',
+    'pages/graficos_gerais.py',
+    'pages/comparacao_de_candidatos_por_votos.py',
+    'pages/identificar_presenca_dos_candidatos.py',
+]
+MODULOS_PESADOS = ['pandas', 'plotly.express', 'requests']
+UF = 'RJ'
+
+
+def _medir(pagina):
+    sys.path.insert(0, str(RAIZ))
+    inicio = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(RAIZ / pagina), default_timeout=300)
+    app.run()
+    return {
+        'segundos': time.perf_counter() - inicio,
+        'excecoes': [excecao.message for excecao in app.exception],
+        'importados': [modulo for modulo in MODULOS_PESADOS if modulo in sys.modules],
+    }
+
+
+def medir_pagina(pagina, ambiente):
+    return executar_em_processo(_medir, ambiente, pagina, descricao=pagina)
+
+
+def executar(repeticoes, linhas):
+    from eleicoes.armazenamento import ingerir_tudo
+    from eleicoes.sintetico import gerar_espelho
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        fonte = os.path.join(pasta, 'fonte')
+        gerar_espelho(fonte, siglas=[UF], linhas=linhas)
+        ambiente = {'ELEICOES_FONTE': fonte, 'ELEICOES_DADOS_DIR': os.path.join(pasta, 'dados')}
+        os.environ.update(ambiente)
+        ingerir_tudo(siglas=[UF])
+        for pagina in PAGINAS:
+            # A primeira execução gera agregados e índices no disco e não entra na conta
+            medir_pagina(pagina, ambiente)
+            medidas = [medir_pagina(pagina, ambiente) for _ in range(repeticoes)]
+            if medidas[-1]['excecoes']:
+                raise RuntimeError(f"{pagina}: {medidas[-1]['excecoes']}")
+            resultados[pagina] = {
+                'segundos': statistics.median(medida['segundos'] for medida in medidas),
+                'importados': medidas[-1]['importados'],
+            }
+            print(f"{pagina:<48} {resultados[pagina]['segundos']:>7.3f} s  {', '.join(resultados[pagina]['importados'])}", flush=True)
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--linhas', type=int, default=200_000, help='linhas por ano dos dados sintéticos')
+    parser.add_argument('--saida', help='gravar os resultados em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.repeticoes, args.linhas)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            encontradas = regressoes(resultados, json.load(arquivo), args.tolerancia, metricas=('segundos',))
+        for regressao in encontradas:
+            print(f'REGRESSÃO {regressao}')
+        return 1 if encontradas else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
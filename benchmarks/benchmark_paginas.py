@@ -0,0 +1,214 @@
+"""
+Benchmark dos pipelines das páginas sobre dados sintéticos.
+
+Gera um espelho sintético de uma UF (por padrão com o porte de São Paulo),
+aponta ELEICOES_FONTE e ELEICOES_DADOS_DIR para diretórios temporários e mede
+cada etapa num processo novo, para que o pico de memória de uma não contamine
+a outra. Para cada etapa são reportados o tempo de parede e o pico de memória
+residente acima do processo recém-iniciado.
+
+Uso:
+    python -m benchmarks.benchmark_paginas [--linhas N] [--saida atual.json]
+                                           [--comparar base.json] [--tolerancia 0.25]
+
+Com ``--comparar`` o processo termina com código 1 se alguma etapa ficar mais
+lenta ou usar mais memória do que a base além da tolerância.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.processos import executar_em_processo
+
+UF = 'SP'
+
+
+def _etapa_ingestao():
+    from eleicoes.armazenamento import ingerir_tudo
+    falhas = ingerir_tudo(siglas=[UF])
+    if falhas:
+        raise RuntimeError(falhas)
+
+
+def _etapa_carregamento():
+    from eleicoes.constantes import anos
+    from eleicoes.registro import RegistroParticoes
+    registro = RegistroParticoes(limite_bytes=1 << 40)
+    for ano in anos:
+        registro.obter(ano, UF)
+
+
+def _etapa_streaming():
+    from eleicoes.constantes import anos
+    from eleicoes.paginacao import pagina, pagina_e_resumo
+    from eleicoes.streaming import resumir, scan_votos
+    # O que a página de geração executa numa seleção em streaming: o total,
+    # a primeira página com o resumo e uma troca de página ordenada
+    consulta, _ = scan_votos([(ano, UF) for ano in anos])
+    resumir(consulta)
+    pagina_e_resumo(consulta, 0, engine='streaming')
+    pagina(consulta, 3, ordem='Votos', decrescente=True, engine='streaming')
+
+
+def _etapa_opcoes_filtros():
+    from eleicoes.catalogo import opcoes
+    from eleicoes.constantes import anos
+    from eleicoes.consultas import opcoes_filtros
+    catalogo = opcoes_filtros(anos, [UF])
+    municipios = opcoes(catalogo['locais'], 'Município')
+    opcoes(catalogo['locais'], 'Bairro', {'Município': municipios[:3]})
+
+
+def _etapa_presenca():
+    from eleicoes.consultas import presenca_candidato
+    from eleicoes.presenca import indice_presenca
+    indice = indice_presenca([UF])
+    for nome in indice.nomes(UF)[:1_000]:
+        presenca_candidato(indice, nome, UF)
+
+
+def _etapa_busca():
+    from eleicoes.busca import buscar_candidatos
+    for consulta in ['jose silva', 'maria conceicao', 'pedor duartte', 'ana', 'zelia ribeiro 12']:
+        buscar_candidatos(consulta, UF)
+
+
+def _etapa_graficos():
+    import polars as pl
+    from eleicoes.agregados import agregado_por_candidato, scan_agregado
+    from eleicoes.constantes import anos
+    from eleicoes.consultas import AGREGADO_POR_COLUNA, comparar_candidatos, paineis_candidato
+    indices = {coluna: agregado_por_candidato(UF, nome) for coluna, nome in AGREGADO_POR_COLUNA.items()}
+    candidatos = indices[None].df.top_k(50, by='Votos')['Nome do candidato'].unique().to_list()
+    for candidato in candidatos:
+        paineis_candidato({coluna: indice.fatia(candidato) for coluna, indice in indices.items()}, candidato, anos)
+    por_ano = {
+        nome: scan_agregado(UF, nome).filter(pl.col('Ano') == anos[-1]).collect()
+        for nome in ['candidato', 'candidato_bairro', 'candidato_municipio']
+    }
+    comparar_candidatos(por_ano['candidato'], por_ano['candidato_bairro'], por_ano['candidato_municipio'], candidatos[:5])
+
+
+def _exportar(formato, filtrar_municipio):
+    import polars as pl
+    from eleicoes.armazenamento import scan_particao
+    from eleicoes.constantes import anos
+    from eleicoes.consultas import filtrar_votos
+    from eleicoes.exportacao import exportar
+    municipio = ['MUNICÍPIO 1'] if filtrar_municipio else None
+    consulta = pl.concat([filtrar_votos(scan_particao(ano, UF), ano, UF, municipio=municipio) for ano in anos])
+    with tempfile.TemporaryDirectory() as pasta:
+        exportar(consulta, formato, os.path.join(pasta, f'exportacao.{formato}'))
+
+
+def _etapa_exportacao_csv_gz():
+    _exportar('csv.gz', filtrar_municipio=False)
+
+
+def _etapa_exportacao_parquet():
+    _exportar('parquet', filtrar_municipio=False)
+
+
+def _etapa_exportacao_xlsx():
+    _exportar('xlsx', filtrar_municipio=True)
+
+
+ETAPAS = {
+    'ingestao': _etapa_ingestao,
+    'carregamento': _etapa_carregamento,
+    'streaming': _etapa_streaming,
+    'opcoes_filtros': _etapa_opcoes_filtros,
+    'presenca': _etapa_presenca,
+    'busca': _etapa_busca,
+    'graficos': _etapa_graficos,
+    'exportacao_csv_gz': _etapa_exportacao_csv_gz,
+    'exportacao_parquet': _etapa_exportacao_parquet,
+    'exportacao_xlsx': _etapa_exportacao_xlsx,
+}
+
+
+def _pico_mb():
+    # VmHWM começa do zero no exec; ru_maxrss herdaria o pico do processo pai no Linux
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for linha in status:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss é em KiB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def _medir(nome):
+    import polars  # noqa: F401  (a importação não entra na medição)
+
+    base = _pico_mb()
+    inicio = time.perf_counter()
+    ETAPAS[nome]()
+    return {'segundos': time.perf_counter() - inicio, 'pico_mb': max(_pico_mb() - base, 0.0)}
+
+
+def medir_etapa(nome, ambiente):
+    return executar_em_processo(_medir, ambiente, nome, descricao=f'Etapa {nome}')
+
+
+def executar(linhas, etapas=None):
+    from eleicoes.sintetico import gerar_espelho
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        fonte = os.path.join(pasta, 'fonte')
+        gerar_espelho(fonte, siglas=[UF], linhas=linhas)
+        ambiente = {'ELEICOES_FONTE': fonte, 'ELEICOES_DADOS_DIR': os.path.join(pasta, 'dados')}
+        for nome in etapas or ETAPAS:
+            resultados[nome] = medir_etapa(nome, ambiente)
+            print(f"{nome:<20} {resultados[nome]['segundos']:>9.3f} s {resultados[nome]['pico_mb']:>9.1f} MB", flush=True)
+    return resultados
+
+
+def regressoes(resultados, base, tolerancia, metricas=('segundos', 'pico_mb')):
+    encontradas = []
+    for nome, medida in resultados.items():
+        if nome not in base:
+            continue
+        for metrica in metricas:
+            anterior = base[nome][metrica]
+            if anterior > 0 and medida[metrica] > anterior * (1 + tolerancia):
+                encontradas.append(f'{nome}: {metrica} {anterior:.3f} -> {medida[metrica]:.3f}')
+    return encontradas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=None, help='linhas por ano (padrão: porte de SP)')
+    parser.add_argument('--etapas', nargs='*', choices=list(ETAPAS), help='etapas a medir (padrão: todas, em ordem)')
+    parser.add_argument('--saida', help='gravar os resultados em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    from eleicoes.sintetico import LINHAS_SP
+    resultados = executar(args.linhas or LINHAS_SP, args.etapas)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            encontradas = regressoes(resultados, json.load(arquivo), args.tolerancia)
+        for regressao in encontradas:
+            print(f'REGRESSÃO {regressao}')
+        return 1 if encontradas else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Medições em processos novos.
+
+Os benchmarks rodam cada medição num processo ``spawn`` recém-criado, para
+que importações, caches e o pico de memória de uma não contaminem a outra.
+O resultado volta ao processo principal por uma fila.
+"""
+
+import multiprocessing
+import os
+import queue
+
+
+def _executar(alvo, ambiente, args, fila):
+    os.environ.update(ambiente)
+    fila.put(alvo(*args))
+
+
+def executar_em_processo(alvo, ambiente, *args, descricao=None):
+    '''
+    Executar ``alvo(*args)`` num processo novo, com ``ambiente`` acrescentado
+    às variáveis de ambiente, e retornar o resultado. ``alvo`` precisa ser uma
+    função de módulo, para ser importada pelo processo filho.
+    '''
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_executar, args=(alvo, ambiente, args, fila))
+    processo.start()
+    # O filho só termina depois que o resultado sai da fila: ler antes do join,
+    # com uma última tentativa depois que ele morre para não perder o que já foi enviado
+    vivo = True
+    while True:
+        try:
+            resultado = fila.get(timeout=1)
+            break
+        except queue.Empty:
+            if not vivo:
+                processo.join()
+                raise RuntimeError(f'{descricao or alvo.__name__} falhou (código {processo.exitcode})') from None
+            vivo = processo.is_alive()
+    processo.join()
+    if processo.exitcode != 0:
+        raise RuntimeError(f'{descricao or alvo.__name__} falhou (código {processo.exitcode})')
+    return resultado
@@ -0,0 +1,174 @@
+"""
+Teste da atualização incremental contra um servidor de arquivos local.
+
+Serve um espelho sintético pelo mesmo servidor HTTP do teste de carga (no
+lugar do GitHub), ingere a UF e monta catálogos, agregados e o índice de
+presença. Depois confere que:
+
+1. sem mudanças na origem, a atualização não baixa nada (respostas 304) e
+   não reingere nenhuma partição, mesmo com o cache de downloads esvaziado;
+2. com um ano regravado na origem, só essa partição é reingerida, só os
+   catálogos dela são refeitos, os agregados da UF são reconstruídos e o
+   registro em memória passa a devolver os dados novos;
+3. um ano ainda não ingerido pedido explicitamente entra como partição nova
+   e passa a constar no índice de presença, que antes o registrava como
+   ausente;
+4. um ano fora de ``constantes.anos`` também é ingerido, ganha coluna no
+   índice de presença e passa a ser oferecido pelas páginas e agregados;
+5. se um derivado falha depois da reingestão, a versão dos dados é trocada
+   mesmo assim.
+
+Termina com código 1 se alguma conferência falhar.
+
+Uso:
+    python -m benchmarks.teste_atualizacao [--linhas 20000]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.teste_carga import ContadorHTTP, servir
+
+UF = 'RJ'
+ANOS = [2020, 2022, 2024]
+
+
+def _mtime(caminho):
+    return caminho.stat().st_mtime_ns
+
+
+def executar(linhas):
+    from eleicoes.sintetico import gerar_espelho
+
+    erros = []
+
+    def conferir(condicao, mensagem):
+        print(f"{'ok  ' if condicao else 'ERRO'} {mensagem}", flush=True)
+        if not condicao:
+            erros.append(mensagem)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        fonte = os.path.join(pasta, 'fonte')
+        gerar_espelho(fonte, siglas=[UF], lista_anos=ANOS, linhas=linhas)
+        servidor = servir(fonte)
+        try:
+            os.environ.update({
+                'ELEICOES_FONTE': f'http://127.0.0.1:{servidor.server_address[1]}',
+                'ELEICOES_DADOS_DIR': os.path.join(pasta, 'dados'),
+            })
+            from eleicoes.agregados import caminho_agregado, scan_agregado
+            from eleicoes.armazenamento import anos_disponiveis, caminho_particao
+            from eleicoes.atualizacao import atualizar, versao_dados
+            from eleicoes.catalogo import caminho_catalogo, carregar_catalogo
+            from eleicoes.constantes import nome_arquivo
+            from eleicoes.presenca import carregar_indice, indice_presenca
+            from eleicoes.registro import RegistroParticoes
+
+            registro = RegistroParticoes(limite_bytes=1 << 40)
+            for ano in ANOS:
+                registro.obter(ano, UF)
+                carregar_catalogo(ano, UF)
+            scan_agregado(UF, 'candidato')
+            # Índice sobre todos os anos: os que faltam na origem ficam registrados como ausentes
+            indice_presenca([UF])
+
+            # 1. Nada mudou
+            ContadorHTTP.bytes_servidos = 0
+            versao = versao_dados()
+            relatorio = atualizar()
+            conferir(sorted(relatorio['igual']) == [(ano, UF) for ano in ANOS], 'sem mudanças todas as partições ficam iguais')
+            conferir(ContadorHTTP.bytes_servidos == 0, f'revalidação sem download ({ContadorHTTP.bytes_servidos} bytes)')
+            conferir(not relatorio['reingeridas'] and versao_dados() == versao, 'nada reingerido e versão mantida')
+
+            # Os validadores gravados no Parquet dispensam o CSV.gz em cache
+            shutil.rmtree(os.path.join(pasta, 'dados', 'downloads'))
+            relatorio = atualizar()
+            conferir(
+                len(relatorio['igual']) == len(ANOS) and ContadorHTTP.bytes_servidos == 0,
+                f'revalidação sem download depois de esvaziar o cache ({ContadorHTTP.bytes_servidos} bytes)',
+            )
+
+            # 2. Um ano corrigido na origem
+            antes = {ano: _mtime(caminho_particao(ano, UF)) for ano in ANOS}
+            catalogos = {ano: _mtime(caminho_catalogo(ano, UF, 'locais')) for ano in ANOS}
+            agregado = _mtime(caminho_agregado(UF, 'candidato'))
+            votos_antes = registro.obter(2024, UF)['Votos'].sum()
+
+            arquivo = gerar_espelho(fonte, siglas=[UF], lista_anos=[2024], linhas=linhas, semente=1) / nome_arquivo(2024, UF)
+            # Last-Modified tem resolução de segundos; o arquivo novo fica claramente mais recente
+            futuro = time.time() + 10
+            os.utime(arquivo, (futuro, futuro))
+
+            ContadorHTTP.bytes_servidos = 0
+            relatorio = atualizar()
+            conferir(relatorio['alterada'] == [(2024, UF)], f"só 2024 alterada ({relatorio['alterada']})")
+            conferir(ContadorHTTP.bytes_servidos == arquivo.stat().st_size, 'só o arquivo alterado foi baixado')
+            conferir(
+                all(_mtime(caminho_particao(ano, UF)) == antes[ano] for ano in ANOS if ano != 2024)
+                and _mtime(caminho_particao(2024, UF)) != antes[2024],
+                'só a partição alterada foi regravada',
+            )
+            conferir(
+                all(_mtime(caminho_catalogo(ano, UF, 'locais')) == catalogos[ano] for ano in ANOS if ano != 2024)
+                and _mtime(caminho_catalogo(2024, UF, 'locais')) != catalogos[2024],
+                'só os catálogos da partição alterada foram refeitos',
+            )
+            conferir(_mtime(caminho_agregado(UF, 'candidato')) != agregado, 'agregados da UF reconstruídos')
+            conferir(versao_dados() != versao, 'versão dos dados trocada')
+            conferir(registro.obter(2024, UF)['Votos'].sum() != votos_antes, 'registro em memória relê a partição nova')
+
+            # 3. Ano novo publicado
+            gerar_espelho(fonte, siglas=[UF], lista_anos=[2018], linhas=linhas)
+            relatorio = atualizar([(ano, UF) for ano in [2018, *ANOS]])
+            conferir(relatorio['nova'] == [(2018, UF)] and relatorio['reingeridas'] == [(2018, UF)], 'ano novo ingerido')
+            conferir(not relatorio['falhas'], f"sem falhas ({relatorio['falhas']})")
+            nome = registro.obter(2018, UF)['Nome do candidato'][0]
+            conferir(2018 in carregar_indice().anos(nome, UF), 'ano novo entra no índice de presença')
+
+            # 4. Ano fora de constantes.anos
+            gerar_espelho(fonte, siglas=[UF], lista_anos=[2026], linhas=linhas)
+            versao = versao_dados()
+            relatorio = atualizar([(2026, UF)])
+            conferir(relatorio['reingeridas'] == [(2026, UF)] and not relatorio['falhas'], 'ano fora de constantes.anos ingerido')
+            conferir(2026 in anos_disponiveis() and versao_dados() != versao, 'ano novo oferecido pelas páginas e versão trocada')
+            nome = registro.obter(2026, UF)['Nome do candidato'][0]
+            conferir(2026 in carregar_indice().anos(nome, UF), 'ano novo ganha coluna no índice de presença')
+            conferir(2026 in scan_agregado(UF, 'candidato').select('Ano').unique().collect()['Ano'].to_list(), 'ano novo nos agregados da UF')
+
+            # 5. Falha num derivado depois da reingestão
+            import eleicoes.atualizacao
+
+            def falhar(particoes):
+                raise RuntimeError('índice indisponível')
+
+            gerar_espelho(fonte, siglas=[UF], lista_anos=[2022], linhas=linhas, semente=2)
+            os.utime(os.path.join(fonte, nome_arquivo(2022, UF)), (futuro + 10, futuro + 10))
+            versao = versao_dados()
+            original, eleicoes.atualizacao.atualizar_indice = eleicoes.atualizacao.atualizar_indice, falhar
+            try:
+                atualizar([(2022, UF)])
+                falhou = False
+            except RuntimeError:
+                falhou = True
+            finally:
+                eleicoes.atualizacao.atualizar_indice = original
+            conferir(falhou and versao_dados() != versao, 'versão trocada mesmo com falha no índice')
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+    return erros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=20_000, help='linhas por ano dos dados sintéticos')
+    args = parser.parse_args(argv)
+    return 1 if executar(args.linhas) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Teste de carga: várias sessões abrindo a mesma UF ao mesmo tempo.
+
+Serve um espelho sintético por um servidor HTTP local (no lugar do GitHub),
+que conta os bytes entregues, e num processo novo dispara ``--sessoes``
+threads que fazem o que a primeira execução das páginas faz para o RJ:
+ler todas as partições pelo registro compartilhado, montar os catálogos de
+filtros, os agregados por candidato e o índice de presença. A rodada é
+repetida com ``ELEICOES_COALESCENCIA=1`` e ``=0`` sobre diretórios de dados
+vazios, e são reportados bytes baixados, tempo de CPU e tempo de parede.
+
+Uso:
+    python -m benchmarks.teste_carga [--sessoes 16] [--linhas 200000]
+"""
+
+import argparse
+import functools
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.processos import executar_em_processo
+
+UF = 'RJ'
+
+
+class ContadorHTTP(SimpleHTTPRequestHandler):
+    """Servidor de arquivos estáticos que conta pedidos e bytes entregues"""
+
+    bytes_servidos = 0
+    pedidos = 0
+    _trava = threading.Lock()
+
+    def copyfile(self, origem, destino):
+        inicio = origem.tell()
+        super().copyfile(origem, destino)
+        with ContadorHTTP._trava:
+            ContadorHTTP.bytes_servidos += origem.tell() - inicio
+            ContadorHTTP.pedidos += 1
+
+    def log_message(self, *args):
+        pass
+
+
+def servir(diretorio):
+    """Servidor HTTP local com os arquivos de ``diretorio``, rodando numa thread"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(ContadorHTTP, directory=diretorio))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _sessao(registro):
+    from eleicoes.agregados import agregado_por_candidato
+    from eleicoes.catalogo import carregar_catalogo
+    from eleicoes.constantes import anos
+    from eleicoes.presenca import indice_presenca
+
+    for ano in anos:
+        registro.obter(ano, UF)
+        carregar_catalogo(ano, UF)
+    agregado_por_candidato(UF, 'candidato')
+    indice_presenca([UF])
+
+
+def _rodada(sessoes):
+    from eleicoes.registro import RegistroParticoes
+
+    registro = RegistroParticoes(limite_bytes=1 << 40)
+    antes = resource.getrusage(resource.RUSAGE_SELF)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessoes) as executor:
+        for futuro in [executor.submit(_sessao, registro) for _ in range(sessoes)]:
+            futuro.result()
+    depois = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'segundos': time.perf_counter() - inicio,
+        'cpu_segundos': (depois.ru_utime - antes.ru_utime) + (depois.ru_stime - antes.ru_stime),
+        'leituras_registro': registro.faltas,
+    }
+
+
+def medir_rodada(sessoes, ambiente):
+    return executar_em_processo(_rodada, ambiente, sessoes, descricao='Rodada')
+
+
+def executar(sessoes, linhas):
+    from eleicoes.sintetico import gerar_espelho
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        fonte = os.path.join(pasta, 'fonte')
+        gerar_espelho(fonte, siglas=[UF], linhas=linhas)
+        servidor = servir(fonte)
+        try:
+            for coalescencia in ('1', '0'):
+                ContadorHTTP.bytes_servidos = ContadorHTTP.pedidos = 0
+                ambiente = {
+                    'ELEICOES_FONTE': f'http://127.0.0.1:{servidor.server_address[1]}',
+                    'ELEICOES_DADOS_DIR': os.path.join(pasta, f'dados-{coalescencia}'),
+                    'ELEICOES_COALESCENCIA': coalescencia,
+                }
+                medida = medir_rodada(sessoes, ambiente)
+                medida.update(bytes_baixados=ContadorHTTP.bytes_servidos, downloads=ContadorHTTP.pedidos)
+                nome = 'com_coalescencia' if coalescencia == '1' else 'sem_coalescencia'
+                resultados[nome] = medida
+                print(
+                    f"{nome:<18} {medida['downloads']:>4} downloads {medida['bytes_baixados'] / 1024 ** 2:>9.1f} MB "
+                    f"{medida['cpu_segundos']:>8.2f} s CPU {medida['segundos']:>8.2f} s "
+                    f"{medida['leituras_registro']:>4} leituras do registro",
+                    flush=True,
+                )
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessoes', type=int, default=16, help='sessões simultâneas')
+    parser.add_argument('--linhas', type=int, default=200_000, help='linhas por ano dos dados sintéticos')
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.sessoes, args.linhas)
+    com, sem = resultados['com_coalescencia'], resultados['sem_coalescencia']
+    if sem['bytes_baixados'] and sem['cpu_segundos']:
+        print(
+            f"Coalescência: {1 - com['bytes_baixados'] / sem['bytes_baixados']:.0%} menos bytes, "
+            f"{1 - com['cpu_segundos'] / sem['cpu_segundos']:.0%} menos CPU"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Camada de dados compartilhada pelas páginas do Streamlit."""
+
+from eleicoes.constantes import anos, estados
+
+__all__ = ['anos', 'estados']
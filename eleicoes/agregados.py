@@ -0,0 +1,179 @@
+"""
+Agregados de votos pré-calculados por UF.
+
+Os gráficos só precisam de somas de ``Votos`` por poucas dimensões, então
+essas somas são materializadas uma vez por UF (todos os anos juntos) em
+``agregados/uf=<UF>/<nome>.parquet``. As páginas consultam essas tabelas
+pequenas em vez das linhas de votação, e o custo de cada interação deixa de
+depender do tamanho do estado. Como as somas são aditivas, qualquer recorte
+por ano ou por conjunto de candidatos pode ser reagregado a partir delas.
+"""
+
+import os
+import threading
+import uuid
+
+import polars as pl
+
+from eleicoes.armazenamento import anos_disponiveis, caminho_particao, particao_em_dia, scan_particao
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.coalescencia import Coalescedor
+from eleicoes.configuracao import diretorio_dados
+from eleicoes.esquema import ESQUEMA
+from eleicoes.metricas import etapa, registrar_cache
+from eleicoes.streaming import usar_streaming
+
+# Nome do agregado -> colunas de agrupamento (além de Ano)
+AGREGADOS = {
+    'candidato': ['Nome do candidato'],
+    'candidato_bairro': ['Nome do candidato', 'Bairro'],
+    'candidato_municipio': ['Nome do candidato', 'Sigla do partido', 'Município'],
+    'candidato_cargo': ['Nome do candidato', 'Cargo'],
+    'partido_municipio': ['Sigla do partido', 'Município'],
+}
+
+_voos = Coalescedor('agregados')
+
+
+def diretorio_agregados(sigla_estado):
+    return diretorio_dados() / 'agregados' / f'uf={sigla_estado.upper()}'
+
+
+def caminho_agregado(sigla_estado, nome):
+    return diretorio_agregados(sigla_estado) / f'{nome}.parquet'
+
+
+def _votos_todos_anos(sigla_estado):
+    colunas = sorted({col for grupo in AGREGADOS.values() for col in grupo} | {'Votos'})
+    # UF sem arquivo em algum ano aparece em ``falhas`` e é ignorada
+    particoes, _ = carregar_particoes([(ano, sigla_estado) for ano in anos_disponiveis()], scan_particao)
+    if not particoes:
+        raise FileNotFoundError(f'Nenhum arquivo encontrado para {sigla_estado}')
+
+    dfs = [
+        df.select(colunas).with_columns(pl.lit(ano).alias('Ano').cast(ESQUEMA['Ano']))
+        for (ano, _), df in particoes.items()
+    ]
+    return pl.concat(dfs)
+
+
+def _consulta_agregado(votos, grupo):
+    """Soma dos votos por Ano + ``grupo``, ordenada para o AgregadoPorCandidato"""
+    return (
+        votos.group_by(['Ano'] + grupo)
+        .agg(pl.col('Votos').sum())
+        # As tabelas são pequenas; texto simples evita categorias nas páginas em pandas
+        .with_columns(pl.col(pl.Categorical).cast(pl.String))
+        .sort(grupo + ['Ano'])
+    )
+
+
+def construir_agregados(sigla_estado):
+    '''
+    Materializar todos os agregados de uma UF.
+    Normalmente as consultas são executadas juntas com ``collect_all``, para
+    que a leitura das partições seja compartilhada entre elas. No modo
+    streaming cada agregado é gravado por vez com ``sink_parquet``, trocando
+    essa leitura compartilhada por um pico de memória menor.
+    '''
+    votos = _votos_todos_anos(sigla_estado)
+    consultas = {nome: _consulta_agregado(votos, grupo) for nome, grupo in AGREGADOS.items()}
+
+    destino = diretorio_agregados(sigla_estado)
+    destino.mkdir(parents=True, exist_ok=True)
+    streaming = usar_streaming([(ano, sigla_estado) for ano in anos_disponiveis()])
+    with etapa('agregados', uf=sigla_estado.upper(), streaming=streaming):
+        if not streaming:
+            resultados = dict(zip(consultas, pl.collect_all(consultas.values())))
+        for nome, consulta in consultas.items():
+            temporario = destino / f'.{uuid.uuid4().hex}.parquet'
+            try:
+                if streaming:
+                    consulta.sink_parquet(temporario, statistics=True)
+                else:
+                    resultados.pop(nome).write_parquet(temporario, statistics=True)
+                os.replace(temporario, caminho_agregado(sigla_estado, nome))
+            finally:
+                temporario.unlink(missing_ok=True)
+
+
+def _desatualizado(sigla_estado):
+    """Algum agregado falta, é mais antigo que uma partição da UF ou a canonização mudou"""
+    particoes = [(ano, caminho_particao(ano, sigla_estado)) for ano in anos_disponiveis()]
+    if any(caminho.exists() and not particao_em_dia(ano, sigla_estado) for ano, caminho in particoes):
+        return True
+    ultima = max((caminho.stat().st_mtime_ns for _, caminho in particoes if caminho.exists()), default=0)
+    for nome in AGREGADOS:
+        caminho = caminho_agregado(sigla_estado, nome)
+        if not caminho.exists() or caminho.stat().st_mtime_ns < ultima:
+            return True
+    return False
+
+
+def atualizar_agregados(sigla_estado):
+    """Reconstruir os agregados da UF se preciso; chamadas simultâneas esperam uma única construção"""
+    if _desatualizado(sigla_estado):
+        _voos.executar(sigla_estado.upper(), _construir_se_desatualizado, sigla_estado)
+
+
+def _construir_se_desatualizado(sigla_estado):
+    if _desatualizado(sigla_estado):
+        construir_agregados(sigla_estado)
+
+
+def scan_agregado(sigla_estado, nome):
+    """LazyFrame de um agregado, construindo os agregados da UF se necessário"""
+    atualizar_agregados(sigla_estado)
+    return pl.scan_parquet(caminho_agregado(sigla_estado, nome))
+
+
+class AgregadoPorCandidato:
+    '''
+    Agregado ordenado por candidato, com o índice nome -> (início, tamanho).
+    ``fatia`` devolve as linhas de um candidato como um slice do DataFrame,
+    sem cópia e sem percorrer as linhas dos demais candidatos.
+    '''
+
+    def __init__(self, df):
+        if not df['Nome do candidato'].is_sorted():
+            df = df.sort('Nome do candidato', maintain_order=True)
+        self.df = df
+        faixas = df.select(pl.col('Nome do candidato').rle()).unnest('Nome do candidato')
+        inicios = faixas['len'].cum_sum() - faixas['len']
+        self._faixas = dict(zip(faixas['value'].to_list(), zip(inicios.to_list(), faixas['len'].to_list())))
+
+    def __len__(self):
+        return len(self._faixas)
+
+    def __contains__(self, nome):
+        return nome in self._faixas
+
+    @property
+    def nomes(self):
+        return list(self._faixas)
+
+    def fatia(self, nome):
+        faixa = self._faixas.get(nome)
+        if faixa is None:
+            return self.df.clear()
+        return self.df.slice(*faixa)
+
+
+_trava = threading.Lock()
+_por_candidato = {}
+
+
+def agregado_por_candidato(sigla_estado, nome):
+    """Agregado da UF indexado por candidato, relido apenas quando o arquivo muda"""
+    caminho = caminho_agregado(sigla_estado, nome)
+    atualizar_agregados(sigla_estado)
+    versao = caminho.stat().st_mtime_ns
+    chave = (sigla_estado.upper(), nome)
+    with _trava:
+        atual = _por_candidato.get(chave)
+        registrar_cache('agregado_por_candidato', acerto=atual is not None and atual[0] == versao)
+        if atual is None or atual[0] != versao:
+            with etapa('indice_candidatos', uf=chave[0], agregado=nome):
+                atual = (versao, AgregadoPorCandidato(pl.read_parquet(caminho)))
+            _por_candidato[chave] = atual
+        return atual[1]
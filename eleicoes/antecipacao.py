@@ -0,0 +1,161 @@
+"""
+Carga antecipada dos dados da UF escolhida.
+
+Quem escolhe uma UF quase sempre acaba pedindo todos os anos dela. Assim que
+a seleção muda, um pool pequeno de threads aquece o que a página vai
+consumir (o ``alvo`` do pedido):
+
+- ``'particoes'`` (geração de dados): ingere os (ano, UF) restantes, monta os
+  catálogos de filtros e, se couber no limite do registro, lê as partições
+  para a memória;
+- ``'agregados'`` (gráficos e comparação): ingere os anos da UF e carrega os
+  agregados por candidato;
+- ``'presenca'`` (presença nas urnas): inclui a UF no índice de presença e
+  monta o índice de busca.
+
+Só a página de geração lê o registro, então as outras não ocupam a memória
+dele. Como as cargas passam pelos coalescedores, uma página que pede o mesmo
+dado durante a antecipação espera a carga em andamento em vez de repeti-la.
+Cada seleção é um ``Pedido``; quando a seleção muda, o pedido anterior é
+cancelado entre uma etapa e outra.
+"""
+
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from eleicoes.agregados import agregado_por_candidato
+from eleicoes.armazenamento import anos_disponiveis, ingerir_particao
+from eleicoes.busca import indice_busca
+from eleicoes.catalogo import carregar_catalogo
+from eleicoes.consultas import AGREGADO_POR_COLUNA
+from eleicoes.metricas import etapa
+from eleicoes.streaming import BYTES_POR_LINHA, linhas_particao
+
+
+class Pedido:
+    """Antecipação de uma seleção de UFs para um alvo, cancelável"""
+
+    def __init__(self, siglas, alvo):
+        self.siglas = siglas
+        self.alvo = alvo
+        self.futuros = []
+        self._cancelado = threading.Event()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def cancelar(self):
+        self._cancelado.set()
+        for futuro in self.futuros:
+            futuro.cancel()
+
+    def concluido(self):
+        return all(futuro.done() for futuro in self.futuros)
+
+
+class Antecipador:
+
+    def __init__(self, registro, max_workers=2):
+        self.registro = registro
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='antecipacao')
+        self._trava = threading.Lock()
+        self.contagem = {'aquecidas': 0, 'canceladas': 0, 'sem_memoria': 0, 'falhas': 0}
+
+    def antecipar(self, siglas, alvo='particoes', lista_anos=None):
+        '''
+        Agendar o aquecimento do ``alvo`` para as UFs em ``siglas``.
+        Com ``'particoes'`` cada (ano, UF) é uma tarefa e as que já estão no
+        registro são puladas; os demais alvos têm uma tarefa por UF.
+        Retorna o ``Pedido``.
+        '''
+        pedido = Pedido(tuple(sorted(sigla_estado.upper() for sigla_estado in siglas)), alvo)
+        lista_anos = [int(ano) for ano in lista_anos or anos_disponiveis()]
+        for sigla_estado in pedido.siglas:
+            if alvo == 'particoes':
+                tarefas = [
+                    ({'ano': ano, 'uf': sigla_estado}, self._etapas_particao(ano, sigla_estado))
+                    for ano in lista_anos
+                    if (ano, sigla_estado) not in self.registro
+                ]
+            elif alvo == 'agregados':
+                tarefas = [({'uf': sigla_estado}, self._etapas_agregados(sigla_estado, lista_anos))]
+            elif alvo == 'presenca':
+                tarefas = [({'uf': sigla_estado}, self._etapas_presenca(sigla_estado))]
+            else:
+                raise ValueError(f'Alvo de antecipação desconhecido: {alvo}')
+            for rotulo, etapas in tarefas:
+                futuro = self._executor.submit(self._aquecer, pedido, etapas, rotulo)
+                futuro.add_done_callback(self._contar_cancelada)
+                pedido.futuros.append(futuro)
+        return pedido
+
+    def _contar(self, resultado):
+        with self._trava:
+            self.contagem[resultado] += 1
+
+    def _contar_cancelada(self, futuro):
+        # Partições que nem saíram da fila
+        if futuro.cancelled():
+            self._contar('canceladas')
+
+    def _aquecer(self, pedido, etapas, rotulo):
+        try:
+            with etapa('antecipacao', alvo=pedido.alvo, **rotulo) as medicao:
+                medicao['resultado'] = self._executar(pedido, etapas)
+        except FileNotFoundError:
+            # Ano (ou UF) sem arquivo: nada a antecipar
+            return
+        except Exception:
+            self._contar('falhas')
+            return
+        self._contar(medicao['resultado'])
+
+    @staticmethod
+    def _executar(pedido, etapas):
+        # O pedido é conferido entre as etapas, então uma seleção nova interrompe esta tarefa
+        for funcao in etapas:
+            if pedido.cancelado:
+                return 'canceladas'
+            resultado = funcao()
+        # Só a leitura para o registro pode desistir por falta de memória
+        return 'sem_memoria' if resultado == 'sem_memoria' else 'aquecidas'
+
+    def _etapas_particao(self, ano, sigla_estado):
+        return [
+            functools.partial(funcao, ano, sigla_estado)
+            for funcao in (ingerir_particao, carregar_catalogo, self._ler_se_couber)
+        ]
+
+    @staticmethod
+    def _etapas_agregados(sigla_estado, lista_anos):
+        # Ingestões por ano primeiro, para que o cancelamento não espere a UF inteira
+        ingestoes = [functools.partial(_ingerir_se_houver, ano, sigla_estado) for ano in lista_anos]
+        indices = [functools.partial(agregado_por_candidato, sigla_estado, nome) for nome in AGREGADO_POR_COLUNA.values()]
+        return ingestoes + indices
+
+    @staticmethod
+    def _etapas_presenca(sigla_estado):
+        # O índice de busca monta (ou reaproveita) o índice de presença da UF
+        return [functools.partial(indice_busca, sigla_estado)]
+
+    def _ler_se_couber(self, ano, sigla_estado):
+        # Só ocupa memória livre: a antecipação nunca faz o registro descartar partições em uso
+        livre = self.registro.limite_bytes - self.registro.estatisticas()['bytes']
+        if linhas_particao(ano, sigla_estado) * BYTES_POR_LINHA > livre:
+            return 'sem_memoria'
+        self.registro.obter(ano, sigla_estado)
+        return 'aquecidas'
+
+    def estatisticas(self):
+        with self._trava:
+            return dict(self.contagem)
+
+
+def _ingerir_se_houver(ano, sigla_estado):
+    # Um ano sem arquivo para a UF não impede os agregados dos demais
+    try:
+        ingerir_particao(ano, sigla_estado)
+    except FileNotFoundError:
+        pass
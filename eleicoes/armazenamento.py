@@ -0,0 +1,179 @@
+"""
+Armazenamento colunar dos dados eleitorais.
+
+Cada arquivo (ano, UF) é convertido uma única vez de CSV.gz para Parquet,
+particionado em ``ano=<ano>/uf=<UF>/dados.parquet``. As linhas são ordenadas
+pelas colunas mais filtradas nas páginas e gravadas em row groups pequenos com
+estatísticas de mínimo/máximo, então ``scan_parquet`` consegue pular os blocos
+que não casam com um ``is_in`` e ler só as colunas projetadas. As colunas de
+texto são gravadas com dicionário (padrão do writer do polars).
+"""
+
+import json
+import os
+import sys
+import uuid
+
+import polars as pl
+
+from eleicoes.canonizacao import CHAVE_METADADOS, canonizar, versao_canonizacao
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.coalescencia import Coalescedor
+from eleicoes.configuracao import diretorio_dados
+from eleicoes.constantes import anos, estados
+from eleicoes.esquema import aplicar_esquema
+from eleicoes.fonte import reservar_origem, sha256_arquivo, validadores_origem
+from eleicoes.metricas import etapa
+
+# Ordem das colunas usada para agrupar as linhas nos row groups
+ORDEM_COLUNAS = ['Município', 'Bairro', 'Sigla do partido', 'Nome do candidato']
+LINHAS_POR_ROW_GROUP = 50_000
+# Hash do CSV.gz de origem, comparado pela atualização incremental
+CHAVE_ORIGEM = 'eleicoes.origem'
+CHAVE_VALIDADORES = 'eleicoes.validadores'
+
+_metadados = {}
+_voos = Coalescedor('ingestao')
+
+
+def caminho_particao(ano, sigla_estado):
+    return diretorio_dados() / 'parquet' / f'ano={ano}' / f'uf={sigla_estado.upper()}' / 'dados.parquet'
+
+
+def anos_disponiveis():
+    '''
+    Anos de ``constantes.anos`` junto com os que já têm partição ingerida,
+    em ordem crescente. Um ano publicado depois entra nas páginas assim que
+    a atualização incremental o ingere.
+    '''
+    ingeridos = {
+        int(pasta.name.removeprefix('ano='))
+        for pasta in (diretorio_dados() / 'parquet').glob('ano=*')
+        if any(pasta.glob('uf=*/dados.parquet'))
+    }
+    return sorted(set(anos) | ingeridos)
+
+
+def ingerir_particao(ano, sigla_estado, forcar=False):
+    '''
+    Converter o CSV.gz de um (ano, UF) para Parquet ordenado e canonizado.
+    Uma partição gravada com outra versão da tabela de apelidos é refeita.
+    A gravação é feita em um arquivo temporário e movida no final, então
+    leitores concorrentes nunca enxergam um arquivo pela metade.
+    Com ``forcar`` a partição é reingerida mesmo se estiver em dia; uma
+    ingestão já em andamento da mesma partição é aproveitada.
+    '''
+    if not forcar and particao_em_dia(ano, sigla_estado):
+        return caminho_particao(ano, sigla_estado)
+    # Sessões que pedem a mesma partição ao mesmo tempo esperam uma única ingestão
+    return _voos.executar((int(ano), sigla_estado.upper()), _ingerir, ano, sigla_estado, forcar)
+
+
+def _ingerir(ano, sigla_estado, forcar):
+    destino = caminho_particao(ano, sigla_estado)
+    versao = versao_canonizacao()
+    if not forcar and particao_em_dia(ano, sigla_estado):
+        return destino
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f'.{uuid.uuid4().hex}.parquet')
+
+    try:
+        with reservar_origem(ano, sigla_estado) as origem:
+            # Descompressão, leitura do CSV e gravação do Parquet rodam juntas no motor do polars
+            with etapa('ingestao', uf=sigla_estado.upper(), ano=ano):
+                sha256 = sha256_arquivo(origem)
+                # Validadores HTTP ficam junto do hash, para revalidar mesmo depois que o CSV.gz sair do cache
+                validadores = validadores_origem(ano, sigla_estado, sha256)
+                df = pl.scan_csv(origem)
+                ordem = [col for col in ORDEM_COLUNAS if col in df.collect_schema().names()]
+                # Ordena como texto antes de converter, para as estatísticas dos row groups
+                aplicar_esquema(canonizar(df).sort(ordem)).sink_parquet(
+                    temporario,
+                    statistics=True,
+                    row_group_size=LINHAS_POR_ROW_GROUP,
+                    metadata={CHAVE_METADADOS: versao, CHAVE_ORIGEM: sha256, CHAVE_VALIDADORES: json.dumps(validadores)},
+                )
+        os.replace(temporario, destino)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+    return destino
+
+
+def _metadados_gravados(caminho):
+    """Metadados do Parquet, lidos uma vez por versão do arquivo"""
+    chave = (str(caminho), caminho.stat().st_mtime_ns)
+    if chave not in _metadados:
+        _metadados[chave] = pl.read_parquet_metadata(caminho)
+    return _metadados[chave]
+
+
+def _versao_gravada(caminho):
+    """Versão da canonização gravada nos metadados"""
+    return _metadados_gravados(caminho).get(CHAVE_METADADOS)
+
+
+def origem_gravada(ano, sigla_estado):
+    '''
+    Hash do CSV.gz usado na última ingestão e os validadores HTTP (ETag e
+    Last-Modified) da resposta que o trouxe, ou None se a partição não existir.
+    '''
+    caminho = caminho_particao(ano, sigla_estado)
+    if not caminho.exists():
+        return None
+    metadados = _metadados_gravados(caminho)
+    return metadados.get(CHAVE_ORIGEM), json.loads(metadados.get(CHAVE_VALIDADORES) or '{}')
+
+
+def particao_em_dia(ano, sigla_estado):
+    """A partição já foi ingerida com a versão atual da canonização"""
+    caminho = caminho_particao(ano, sigla_estado)
+    return caminho.exists() and _versao_gravada(caminho) == versao_canonizacao()
+
+
+def scan_particao(ano, sigla_estado):
+    """LazyFrame de um (ano, UF), ingerindo o arquivo na primeira leitura"""
+    return aplicar_esquema(pl.scan_parquet(ingerir_particao(ano, sigla_estado)))
+
+
+def memoria_uf(sigla_estado, lista_anos=None):
+    '''
+    Memória ocupada pelos anos da UF carregados com o esquema canônico.
+    Retorna linhas e megabytes por ano, junto com o tamanho das mesmas
+    colunas carregadas como texto.
+    '''
+    def medir(ano, sigla_estado):
+        df = scan_particao(ano, sigla_estado).collect()
+        texto = df.with_columns(pl.col(pl.Categorical).cast(pl.String))
+        return df.height, df.estimated_size('mb'), texto.estimated_size('mb')
+
+    resultados, _ = carregar_particoes([(ano, sigla_estado) for ano in lista_anos or anos_disponiveis()], medir)
+    return pl.DataFrame(
+        [(ano, sigla, *medidas) for (ano, sigla), medidas in resultados.items()],
+        schema=['Ano', 'UF', 'Linhas', 'MB', 'MB como texto'],
+        orient='row',
+    )
+
+
+def ingerir_tudo(lista_anos=None, siglas=None, forcar=False):
+    particoes = [(ano, sigla_estado) for ano in lista_anos or anos for sigla_estado in siglas or estados.keys()]
+    _, falhas = carregar_particoes(particoes, lambda ano, sigla_estado: ingerir_particao(ano, sigla_estado, forcar=forcar))
+    return falhas
+
+
+if __name__ == '__main__':
+    # python -m eleicoes.armazenamento [UF ...]
+    from eleicoes.catalogo import carregar_catalogo
+    from eleicoes.presenca import atualizar_indice
+
+    siglas = [s.upper() for s in sys.argv[1:]] or list(estados)
+    falhas = ingerir_tudo(siglas=siglas)
+    for (ano, sigla_estado), erro in falhas.items():
+        print(f'{ano} {sigla_estado}: {erro}')
+    particoes = [(ano, sigla_estado) for ano in anos for sigla_estado in siglas]
+    carregar_particoes([particao for particao in particoes if particao not in falhas], carregar_catalogo)
+    atualizar_indice(particoes)
+    for sigla_estado in siglas:
+        relatorio = memoria_uf(sigla_estado)
+        print(f"{sigla_estado}: {relatorio['MB'].sum():.1f} MB em memória ({relatorio['MB como texto'].sum():.1f} MB como texto)")
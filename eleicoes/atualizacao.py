@@ -0,0 +1,157 @@
+"""
+Atualização incremental dos dados de origem.
+
+Os arquivos do repositório de origem mudam quando totais são corrigidos ou
+quando um ano novo é publicado. Para cada (ano, UF) a atualização compara o
+hash do CSV.gz atual na origem com o hash gravado nos metadados do Parquet
+na ingestão, e só as partições que mudaram são reingeridas. Com origem HTTP
+a comparação usa o ETag/Last-Modified também gravados no Parquet, então não
+depende de o CSV.gz continuar no cache de downloads. Em seguida são refeitos apenas os
+derivados afetados: os catálogos dessas partições, os agregados das UFs
+envolvidas e o índice de presença (a busca acompanha o índice).
+
+Todos os arquivos são trocados com ``os.replace``, então as páginas seguem
+lendo a versão anterior até a troca e nunca veem um arquivo pela metade. O
+registro em memória e os caches por processo comparam o mtime dos arquivos,
+e os ``st.cache_data`` das páginas recebem ``versao_dados()`` como argumento:
+uma atualização com mudanças grava um novo marcador e as entradas antigas
+deixam de ser usadas, sem reiniciar o servidor.
+
+Uso:
+    python -m eleicoes.atualizacao [--anos 2024 ...] [--ufs RJ ...] [--intervalo SEGUNDOS]
+
+Sem ``--anos`` e ``--ufs`` são conferidas as partições já ingeridas; com
+eles, partições ainda não ingeridas (um ano novo, por exemplo) também entram.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+from eleicoes.agregados import atualizar_agregados
+from eleicoes.armazenamento import anos_disponiveis, ingerir_particao, origem_gravada
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.catalogo import carregar_catalogo
+from eleicoes.configuracao import diretorio_dados
+from eleicoes.constantes import estados
+from eleicoes.fonte import sha256_origem
+from eleicoes.metricas import etapa
+from eleicoes.presenca import atualizar_indice
+
+
+def caminho_versao():
+    return diretorio_dados() / 'versao_dados'
+
+
+def versao_dados():
+    """Marcador da última atualização com mudanças, para compor chaves de cache"""
+    try:
+        return caminho_versao().read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return ''
+
+
+def _marcar_versao():
+    caminho = caminho_versao()
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(f'.{uuid.uuid4().hex}')
+    temporario.write_text(f'{time.time_ns()}', encoding='utf-8')
+    os.replace(temporario, caminho)
+
+
+def particoes_ingeridas():
+    """(ano, UF) de todas as partições já convertidas para Parquet"""
+    particoes = []
+    for caminho in sorted((diretorio_dados() / 'parquet').glob('ano=*/uf=*/dados.parquet')):
+        ano = int(caminho.parent.parent.name.removeprefix('ano='))
+        particoes.append((ano, caminho.parent.name.removeprefix('uf=')))
+    return particoes
+
+
+def verificar_particao(ano, sigla_estado):
+    '''
+    Situação da partição em relação à origem: 'igual', 'alterada' (o hash
+    mudou ou não foi gravado), 'nova' (ainda não ingerida) ou 'ausente'
+    (sem arquivo na origem).
+    '''
+    gravada = origem_gravada(ano, sigla_estado)
+    try:
+        atual = sha256_origem(ano, sigla_estado, gravada)
+    except FileNotFoundError:
+        return 'ausente'
+    if gravada is None:
+        return 'nova'
+    return 'igual' if gravada[0] == atual else 'alterada'
+
+
+def atualizar(particoes=None):
+    '''
+    Conferir as partições na origem e refazer só o que mudou.
+    Retorna um relatório com as partições por situação e as falhas.
+    Um ano novo ingerido aqui ganha coluna no índice de presença e passa a
+    ser oferecido pelas páginas (``anos_disponiveis``).
+    '''
+    particoes = [(int(ano), sigla_estado.upper()) for ano, sigla_estado in (particoes or particoes_ingeridas())]
+    with etapa('atualizacao', particoes=len(particoes)) as medicao:
+        situacoes, falhas = carregar_particoes(particoes, verificar_particao)
+        mudadas = [particao for particao, situacao in situacoes.items() if situacao in ('alterada', 'nova')]
+
+        reingeridas, falhas_ingestao = carregar_particoes(
+            mudadas, lambda ano, sigla_estado: ingerir_particao(ano, sigla_estado, forcar=True)
+        )
+        falhas |= falhas_ingestao
+        reingeridas = list(reingeridas)
+        if reingeridas:
+            try:
+                # Derivados refeitos agora, em vez de na primeira visita de cada página
+                _, falhas_catalogo = carregar_particoes(reingeridas, carregar_catalogo)
+                falhas |= falhas_catalogo
+                for sigla_estado in sorted({sigla_estado for _, sigla_estado in reingeridas}):
+                    atualizar_agregados(sigla_estado)
+                atualizar_indice(reingeridas)
+            finally:
+                # As partições já foram trocadas: os caches das páginas precisam
+                # deixar as versões antigas mesmo se um derivado falhou
+                _marcar_versao()
+        medicao['reingeridas'] = len(reingeridas)
+
+    relatorio = {situacao: [] for situacao in ('igual', 'alterada', 'nova', 'ausente')}
+    for particao, situacao in situacoes.items():
+        relatorio[situacao].append(particao)
+    relatorio['reingeridas'] = reingeridas
+    relatorio['falhas'] = falhas
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Atualização incremental dos dados de origem')
+    parser.add_argument('--anos', nargs='*', type=int, help='anos a conferir (padrão: os já ingeridos)')
+    parser.add_argument('--ufs', nargs='*', help='UFs a conferir (padrão: as já ingeridas)')
+    parser.add_argument('--intervalo', type=float, help='repetir a cada tantos segundos, em vez de rodar uma vez')
+    args = parser.parse_args(argv)
+
+    particoes = None
+    if args.anos or args.ufs:
+        siglas = [sigla.upper() for sigla in args.ufs or estados]
+        particoes = [(ano, sigla_estado) for ano in args.anos or anos_disponiveis() for sigla_estado in siglas]
+
+    while True:
+        relatorio = atualizar(particoes)
+        for ano, sigla_estado in relatorio['reingeridas']:
+            print(f'{ano} {sigla_estado}: reingerida')
+        for (ano, sigla_estado), erro in relatorio['falhas'].items():
+            print(f'{ano} {sigla_estado}: ERRO {erro}')
+        print(
+            f"{len(relatorio['igual'])} iguais, {len(relatorio['alterada'])} alteradas, "
+            f"{len(relatorio['nova'])} novas, {len(relatorio['ausente'])} ausentes",
+            flush=True,
+        )
+        if not args.intervalo:
+            return 1 if relatorio['falhas'] else 0
+        time.sleep(args.intervalo)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
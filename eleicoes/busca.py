@@ -0,0 +1,103 @@
+"""
+Busca aproximada de nomes de candidatos.
+
+Os nomes distintos de cada UF (vindos do índice de presença) são quebrados em
+trigramas depois de normalizados, o que torna a busca indiferente a acentos e
+caixa. Uma consulta é pontuada contra todos os nomes de uma vez pelo
+coeficiente de Dice entre os conjuntos de trigramas, que tolera erros de
+digitação, e só os ``k`` melhores nomes são devolvidos.
+"""
+
+import threading
+
+import polars as pl
+
+from eleicoes.metricas import etapa, registrar_cache
+from eleicoes.presenca import expr_normalizar_nome, indice_presenca, normalizar_nome
+
+
+def trigramas(nome):
+    nome = f' {normalizar_nome(nome)} '
+    return {nome[i:i + 3] for i in range(len(nome) - 2)}
+
+
+class IndiceTrigramas:
+    '''
+    Índice invertido trigrama -> nomes.
+    Os ids dos nomes ficam numa única Series ordenada por trigrama, e
+    ``_faixas`` guarda o intervalo (início, fim) de cada trigrama nela, então
+    a lista de um trigrama é uma fatia sem cópia.
+    '''
+
+    def __init__(self, nomes):
+        nomes = (
+            pl.DataFrame({'Nome do candidato': list(nomes)}, schema={'Nome do candidato': pl.String})
+            .unique(maintain_order=True)
+            .with_columns((' ' + expr_normalizar_nome() + ' ').alias('chave'))
+            .filter(pl.col('chave').str.len_chars() > 2)
+        )
+        postings = (
+            nomes
+            .with_row_index('id')
+            .select('id', pl.int_ranges(0, pl.col('chave').str.len_chars() - 2).alias('i'), 'chave')
+            .explode('i')
+            .drop_nulls('i')
+            .select('id', pl.col('chave').str.slice(pl.col('i'), 3).alias('trigrama'))
+            .unique()
+            .sort(['trigrama', 'id'])
+        )
+        faixas = (
+            postings
+            .with_row_index('posicao')
+            .group_by('trigrama')
+            .agg(pl.col('posicao').min().alias('inicio'), pl.len().alias('tamanho'))
+        )
+        self._ids = postings['id']
+        self._faixas = {t: (inicio, tamanho) for t, inicio, tamanho in faixas.iter_rows()}
+        self._nomes = nomes['Nome do candidato']
+        self._n_trigramas = postings.group_by('id').agg(pl.len()).sort('id')['len']
+
+    def __len__(self):
+        return len(self._nomes)
+
+    def buscar(self, consulta, k=10, similaridade_minima=0.2):
+        """Os ``k`` nomes mais parecidos com a consulta, com a similaridade de cada um"""
+        trigramas_consulta = trigramas(consulta)
+        fatias = [self._ids.slice(*self._faixas[t]) for t in trigramas_consulta if t in self._faixas]
+        if not fatias:
+            return pl.DataFrame(schema={'Nome do candidato': pl.String, 'similaridade': pl.Float64})
+
+        comuns = pl.concat(fatias).value_counts(name='comuns')
+        return (
+            comuns
+            .with_columns(
+                (2 * pl.col('comuns') / (self._n_trigramas.gather(comuns['id']) + len(trigramas_consulta))).alias('similaridade'),
+                self._nomes.gather(comuns['id']).alias('Nome do candidato'),
+            )
+            .filter(pl.col('similaridade') >= similaridade_minima)
+            .sort(['similaridade', 'Nome do candidato'], descending=[True, False])
+            .head(k)
+            .select('Nome do candidato', 'similaridade')
+        )
+
+
+_trava = threading.Lock()
+_indices = {}
+
+
+def indice_busca(sigla_estado):
+    """Índice de trigramas da UF, reconstruído quando o índice de presença muda"""
+    presenca = indice_presenca([sigla_estado])
+    chave = sigla_estado.upper()
+    with _trava:
+        atual = _indices.get(chave)
+        registrar_cache('busca', acerto=atual is not None and atual[0] is presenca)
+        if atual is None or atual[0] is not presenca:
+            with etapa('indice_busca', uf=chave):
+                atual = (presenca, IndiceTrigramas(presenca.nomes(sigla_estado)))
+            _indices[chave] = atual
+        return atual[1]
+
+
+def buscar_candidatos(consulta, sigla_estado, k=10):
+    return indice_busca(sigla_estado).buscar(consulta, k=k)
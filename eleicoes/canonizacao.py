@@ -0,0 +1,82 @@
+"""
+Nomes canônicos dos candidatos, aplicados uma única vez na ingestão.
+
+O mesmo candidato pode aparecer com grafias diferentes de um ano para outro
+(caixa, espaços, sufixos como "JR"). Na ingestão o nome é limpo (maiúsculo,
+sem espaços repetidos) e passa pela tabela de apelidos, um CSV com as colunas
+``nome`` e ``canonico`` (``ELEICOES_APELIDOS``, por padrão
+``eleicoes/apelidos.csv``); o cargo é gravado em maiúsculas. O Parquet já sai
+com os valores canônicos em dicionário, então nenhuma leitura reescreve texto.
+
+A versão da tabela fica nos metadados de cada partição: se a tabela mudar,
+a partição é reingerida na próxima leitura.
+"""
+
+import hashlib
+import json
+
+import polars as pl
+
+from eleicoes.configuracao import caminho_apelidos
+
+# Mudar quando as regras de limpeza mudarem, para forçar a reingestão
+VERSAO_REGRAS = 1
+CHAVE_METADADOS = 'eleicoes.canonizacao'
+
+_carregados = {}
+
+
+def limpar(nome):
+    """Nome em maiúsculas e com espaços únicos"""
+    return ' '.join(str(nome).upper().split())
+
+
+def expr_limpar(coluna='Nome do candidato'):
+    """Mesma limpeza de ``limpar`` como expressão do polars"""
+    return (
+        pl.col(coluna)
+        .cast(pl.String)
+        .str.to_uppercase()
+        .str.replace_all(r'\s+', ' ')
+        .str.strip_chars()
+    )
+
+
+def carregar_apelidos():
+    """Dicionário nome limpo -> nome canônico, relido quando o arquivo muda"""
+    caminho = caminho_apelidos()
+    versao = caminho.stat().st_mtime_ns if caminho.exists() else None
+    chave = str(caminho)
+    if chave not in _carregados or _carregados[chave][0] != versao:
+        apelidos = {}
+        if versao is not None:
+            tabela = pl.read_csv(caminho, schema={'nome': pl.String, 'canonico': pl.String})
+            apelidos = {limpar(nome): limpar(canonico) for nome, canonico in tabela.iter_rows()}
+        _carregados[chave] = (versao, apelidos)
+    return _carregados[chave][1]
+
+
+def versao_canonizacao():
+    """Identificador das regras e da tabela de apelidos em uso"""
+    conteudo = json.dumps([VERSAO_REGRAS, sorted(carregar_apelidos().items())], ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+
+def canonico(nome):
+    """Nome canônico de um nome digitado ou lido de um arquivo"""
+    nome = limpar(nome)
+    return carregar_apelidos().get(nome, nome)
+
+
+def canonizar(df):
+    """Aplicar a limpeza e os apelidos a ``Nome do candidato`` e deixar ``Cargo`` em maiúsculas"""
+    apelidos = carregar_apelidos()
+    nome = expr_limpar('Nome do candidato')
+    if apelidos:
+        nome = nome.replace(apelidos)
+    expressoes = {
+        'Nome do candidato': nome,
+        'Cargo': pl.col('Cargo').cast(pl.String).str.to_uppercase(),
+    }
+    colunas = df.collect_schema().names()
+    return df.with_columns([expr.alias(col) for col, expr in expressoes.items() if col in colunas])
@@ -0,0 +1,37 @@
+"""
+Carregamento concorrente de partições (ano, UF).
+
+Download, descompressão e leitura de cada arquivo são independentes, então
+as partições são processadas num pool de threads limitado por
+``ELEICOES_MAX_WORKERS``. Uma falha numa partição não interrompe as demais:
+ela é devolvida separadamente para que a página possa avisar quais (ano, UF)
+não foram carregados.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from eleicoes.configuracao import max_workers_carregamento
+
+
+def carregar_particoes(particoes, funcao, max_workers=None):
+    '''
+    Executar ``funcao(ano, sigla_estado)`` para cada partição em paralelo.
+    Retorna ``(resultados, falhas)``, dois dicionários indexados por
+    (ano, UF); ``resultados`` segue a ordem de ``particoes``.
+    '''
+    particoes = list(dict.fromkeys(particoes))
+    if not particoes:
+        return {}, {}
+
+    max_workers = min(max_workers or max_workers_carregamento(), len(particoes))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {particao: executor.submit(funcao, *particao) for particao in particoes}
+
+    resultados, falhas = {}, {}
+    for particao, futuro in futuros.items():
+        erro = futuro.exception()
+        if erro is None:
+            resultados[particao] = futuro.result()
+        else:
+            falhas[particao] = erro
+    return resultados, falhas
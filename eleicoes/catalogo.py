@@ -0,0 +1,103 @@
+"""
+Catálogo de valores distintos de cada partição (ano, UF).
+
+Os filtros da página de geração só precisam dos valores distintos de
+``Bairro``, ``Município``, ``Sigla do partido`` e ``Nome do candidato``. Em
+vez de ler essas colunas inteiras a cada troca de ano ou UF, cada partição
+ganha duas tabelas pequenas em ``catalogos/ano=<ano>/uf=<UF>/``:
+
+- ``locais``: bairros de cada município, com a quantidade de linhas;
+- ``candidaturas``: candidatos de cada partido, com linhas e votos.
+
+Guardar os pares (município, bairro) e (partido, candidato) permite
+estreitar um filtro pelo outro.
+"""
+
+import os
+import uuid
+
+import polars as pl
+
+from eleicoes.armazenamento import caminho_particao, ingerir_particao
+from eleicoes.coalescencia import Coalescedor
+from eleicoes.configuracao import diretorio_dados
+
+CATALOGOS = {
+    'locais': ['Município', 'Bairro'],
+    'candidaturas': ['Sigla do partido', 'Nome do candidato'],
+}
+
+_voos = Coalescedor('catalogo')
+
+
+def caminho_catalogo(ano, sigla_estado, nome):
+    return diretorio_dados() / 'catalogos' / f'ano={ano}' / f'uf={sigla_estado.upper()}' / f'{nome}.parquet'
+
+
+def construir_catalogo(ano, sigla_estado):
+    """Gerar os catálogos de uma partição a partir do Parquet ingerido"""
+    df = pl.scan_parquet(ingerir_particao(ano, sigla_estado))
+    consultas = [
+        df.group_by(colunas)
+        .agg(pl.len().alias('Linhas'), pl.col('Votos').sum())
+        .with_columns(pl.col(colunas).cast(pl.String))
+        .sort(colunas)
+        for colunas in CATALOGOS.values()
+    ]
+    for nome, catalogo in zip(CATALOGOS, pl.collect_all(consultas)):
+        destino = caminho_catalogo(ano, sigla_estado, nome)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_name(f'.{uuid.uuid4().hex}.parquet')
+        catalogo.write_parquet(temporario)
+        os.replace(temporario, destino)
+
+
+def _desatualizado(ano, sigla_estado):
+    particao = caminho_particao(ano, sigla_estado)
+    for nome in CATALOGOS:
+        caminho = caminho_catalogo(ano, sigla_estado, nome)
+        if not caminho.exists() or caminho.stat().st_mtime_ns < particao.stat().st_mtime_ns:
+            return True
+    return False
+
+
+def _construir_se_desatualizado(ano, sigla_estado):
+    if _desatualizado(ano, sigla_estado):
+        construir_catalogo(ano, sigla_estado)
+
+
+def carregar_catalogo(ano, sigla_estado):
+    '''
+    Catálogos de uma partição como ``{nome: DataFrame}``.
+    São gerados na primeira leitura e de novo sempre que a partição for
+    reingerida depois deles.
+    '''
+    ingerir_particao(ano, sigla_estado)
+    if _desatualizado(ano, sigla_estado):
+        _voos.executar((int(ano), sigla_estado.upper()), _construir_se_desatualizado, ano, sigla_estado)
+    return {nome: pl.read_parquet(caminho_catalogo(ano, sigla_estado, nome)) for nome in CATALOGOS}
+
+
+def juntar_catalogos(catalogos):
+    """Somar os catálogos de várias partições"""
+    return {
+        nome: (
+            pl.concat([catalogo[nome] for catalogo in catalogos])
+            .group_by(colunas)
+            .agg(pl.col('Linhas').sum(), pl.col('Votos').sum())
+            .sort(colunas)
+        )
+        for nome, colunas in CATALOGOS.items()
+    }
+
+
+def opcoes(catalogo, coluna, filtros=None):
+    '''
+    Valores distintos de ``coluna`` em ordem alfabética.
+    ``filtros`` restringe as linhas do catálogo antes, por exemplo
+    ``{'Município': ['NITERÓI']}`` para listar só os bairros de Niterói.
+    '''
+    for filtro, valores in (filtros or {}).items():
+        if valores:
+            catalogo = catalogo.filter(pl.col(filtro).is_in(valores))
+    return catalogo.get_column(coluna).unique().sort().to_list()
@@ -0,0 +1,61 @@
+"""
+Coalescência de cargas simultâneas (single-flight).
+
+Várias sessões abrindo a mesma página ao mesmo tempo pedem as mesmas
+partições, e nem o ``st.cache_data`` nem os caches em disco evitam que cada
+uma faça o mesmo download, a mesma ingestão ou a mesma leitura enquanto a
+primeira ainda não terminou. Um ``Coalescedor`` deixa só a primeira chamada
+de cada chave executar; as que chegam durante a carga esperam por ela e
+recebem o mesmo resultado (ou a mesma exceção).
+"""
+
+import threading
+from concurrent.futures import Future
+
+from eleicoes.configuracao import coalescencia_ativa
+
+
+class Coalescedor:
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._trava = threading.Lock()
+        self._em_andamento = {}
+        self.execucoes = 0
+        self.compartilhadas = 0
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        '''
+        Executar ``funcao`` para ``chave``, ou esperar a execução em andamento.
+        Com ``ELEICOES_COALESCENCIA=0`` toda chamada executa a função.
+        '''
+        if not coalescencia_ativa():
+            return funcao(*args, **kwargs)
+
+        with self._trava:
+            futuro = self._em_andamento.get(chave)
+            lider = futuro is None
+            if lider:
+                futuro = self._em_andamento[chave] = Future()
+                self.execucoes += 1
+            else:
+                self.compartilhadas += 1
+
+        if not lider:
+            return futuro.result()
+
+        try:
+            resultado = funcao(*args, **kwargs)
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
+
+    def estatisticas(self):
+        with self._trava:
+            return {'execucoes': self.execucoes, 'compartilhadas': self.compartilhadas}
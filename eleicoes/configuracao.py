@@ -0,0 +1,75 @@
+"""Configurações lidas do ambiente, com os valores padrão da aplicação."""
+
+import os
+from pathlib import Path
+
+from eleicoes.constantes import URL_BASE
+
+LIMITE_CACHE_PADRAO = 2 * 1024 ** 3
+
+
+def diretorio_dados():
+    """Raiz dos dados locais (ELEICOES_DADOS_DIR)"""
+    raiz = os.environ.get('ELEICOES_DADOS_DIR')
+    if raiz:
+        return Path(raiz)
+    return Path(__file__).resolve().parent.parent / '.dados'
+
+
+def raiz_origem():
+    """URL base, diretório local ou raiz file:// dos CSV.gz (ELEICOES_FONTE)"""
+    return os.environ.get('ELEICOES_FONTE', URL_BASE)
+
+
+def limite_cache_downloads():
+    """Limite em bytes do cache de downloads (ELEICOES_CACHE_MAX_BYTES)"""
+    return int(os.environ.get('ELEICOES_CACHE_MAX_BYTES', LIMITE_CACHE_PADRAO))
+
+
+def max_workers_carregamento():
+    """Quantidade máxima de partições carregadas em paralelo (ELEICOES_MAX_WORKERS)"""
+    return int(os.environ.get('ELEICOES_MAX_WORKERS', 8))
+
+
+def limite_registro():
+    """Limite em bytes das partições mantidas em memória (ELEICOES_REGISTRO_MAX_BYTES)"""
+    return int(os.environ.get('ELEICOES_REGISTRO_MAX_BYTES', 1024 ** 3))
+
+
+def log_metricas():
+    """Destino das linhas JSON de métricas: arquivo, '-' para stderr ou vazio (ELEICOES_LOG_METRICAS)"""
+    return os.environ.get('ELEICOES_LOG_METRICAS', '')
+
+
+def depuracao():
+    """Exibir o painel de métricas em todas as páginas (ELEICOES_DEPURACAO)"""
+    return os.environ.get('ELEICOES_DEPURACAO', '').lower() in ('1', 'true', 'sim')
+
+
+def modo_streaming():
+    """'sim', 'nao' ou 'auto' (padrão): quando usar o motor de streaming (ELEICOES_STREAMING)"""
+    modo = os.environ.get('ELEICOES_STREAMING', 'auto').lower()
+    return {'1': 'sim', 'true': 'sim', '0': 'nao', 'false': 'nao', 'não': 'nao'}.get(modo, modo)
+
+
+def limite_memoria():
+    """Tamanho estimado acima do qual uma seleção não é materializada (ELEICOES_MEMORIA_MAX_BYTES)"""
+    return int(os.environ.get('ELEICOES_MEMORIA_MAX_BYTES', 1024 ** 3))
+
+
+def caminho_apelidos():
+    """Tabela de apelidos dos candidatos, CSV com as colunas nome e canonico (ELEICOES_APELIDOS)"""
+    caminho = os.environ.get('ELEICOES_APELIDOS')
+    if caminho:
+        return Path(caminho)
+    return Path(__file__).resolve().parent / 'apelidos.csv'
+
+
+def coalescencia_ativa():
+    """Juntar cargas simultâneas da mesma chave numa só (ELEICOES_COALESCENCIA, padrão ligado)"""
+    return os.environ.get('ELEICOES_COALESCENCIA', '1').lower() not in ('0', 'false', 'nao', 'não')
+
+
+def threads_antecipacao():
+    """Threads da carga antecipada das partições da UF escolhida; 0 desliga (ELEICOES_ANTECIPACAO)"""
+    return int(os.environ.get('ELEICOES_ANTECIPACAO', 2))
@@ -0,0 +1,45 @@
+from urllib.parse import quote
+
+estados = {
+        'AC': 'Acre',
+        'AL': 'Alagoas',
+        'AP': 'Amapá',
+        'AM': 'Amazonas',
+        'BA': 'Bahia',
+        'CE': 'Ceará',
+        'DF': 'Distrito Federal',
+        'ES': 'Espírito Santo',
+        'GO': 'Goiás',
+        'MA': 'Maranhão',
+        'MT': 'Mato Grosso',
+        'MS': 'Mato Grosso do Sul',
+        'MG': 'Minas Gerais',
+        'PA': 'Pará',
+        'PB': 'Paraiba',
+        'PR': 'Paraná',
+        'PE': 'Pernambuco',
+        'PI': 'Piauí',
+        'RJ': 'Rio de Janeiro',
+        'RN': 'Rio Grande do Norte',
+        'RS': 'Rio Grande do Sul',
+        'RO': 'Rondônia',
+        'RR': 'Roraima',
+        'SC': 'Santa Catarina',
+        'SP': 'São Paulo',
+        'SE': 'Sergipe',
+        'TO': 'Tocantins'
+}
+
+anos = [2016, 2018, 2020, 2022, 2024]
+
+URL_BASE = 'https://raw.githubusercontent.com/HugoCDM/candidatos/main'
+
+
+def nome_arquivo(ano, sigla_estado):
+    """Nome do arquivo de origem de um (ano, UF) no repositório de candidatos"""
+    return f'Eleições {ano} - {estados[sigla_estado.upper()]}.csv.gz'
+
+
+def url_arquivo(ano, sigla_estado, base=URL_BASE):
+    """URL do arquivo de origem de um (ano, UF), por padrão no GitHub"""
+    return f'{base.rstrip("/")}/{quote(nome_arquivo(ano, sigla_estado))}'
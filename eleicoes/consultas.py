@@ -0,0 +1,179 @@
+"""
+Consultas usadas pelas páginas, como funções comuns.
+
+Nada aqui depende do Streamlit: as páginas só cuidam de cache, widgets e
+gráficos, e as mesmas funções podem ser chamadas pelos benchmarks e por
+scripts de linha de comando.
+"""
+
+import polars as pl
+
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.catalogo import carregar_catalogo, juntar_catalogos
+from eleicoes.constantes import estados
+from eleicoes.esquema import aplicar_esquema
+
+# Agregado pré-calculado usado por cada gráfico
+AGREGADO_POR_COLUNA = {
+    None: 'candidato',
+    'Bairro': 'candidato_bairro',
+    'Município': 'candidato_municipio',
+    'Cargo': 'candidato_cargo',
+}
+
+
+def filtrar_votos(df, ano, sigla_estado, bairro=None, municipio=None, candidato=None, partido=None, columns=None):
+    '''
+    Aplicar a projeção e os filtros da página de geração a uma partição.
+    Filtros vazios são ignorados; as colunas Ano e UF são adicionadas.
+    '''
+    if columns:
+        df = df.select(columns)
+
+    df = aplicar_esquema(df.with_columns(pl.lit(ano).alias('Ano'), pl.lit(sigla_estado.upper()).alias('UF')))
+
+    if bairro:
+        df = df.filter(pl.col('Bairro').is_in(bairro))
+
+    if partido:
+        df = df.filter(pl.col('Sigla do partido').is_in(partido))
+
+    if candidato:
+        df = df.filter(pl.col('Nome do candidato').is_in(candidato))
+
+    if municipio:
+        df = df.filter(pl.col('Município').is_in(municipio))
+
+    return df
+
+
+def nome_exportacao(ano, sigla_estado, bairro='', municipio='', candidato='', partido='', extensao='xlsx'):
+    """Nome do arquivo exportado, montado a partir dos anos, UFs e filtros"""
+    params = []
+
+    if ano:
+        ano_list = ' e '.join(ano)
+
+    if bairro:
+        params.append(' e '.join(bairro))
+
+    if municipio:
+        params.append(' e '.join(municipio))
+
+    if candidato:
+        params.append(' e '.join(candidato))
+
+    if partido:
+        params.append('(' + ' e '.join(partido) + ')')
+
+    filename = f'ELEIÇÕES {ano_list} {sigla_estado}'
+    if params:
+        filename += ' ' + f"{' - '.join(params)}"
+    filename += f'.{extensao}'
+
+    return filename
+
+
+def opcoes_filtros(anos_select, siglas_estado):
+    """Catálogo somado das partições selecionadas, ou None se nenhuma existir"""
+    particoes = [(ano, sigla_estado) for ano in anos_select for sigla_estado in siglas_estado]
+    resultados, _ = carregar_particoes(particoes, carregar_catalogo)
+    if not resultados:
+        return None
+    return juntar_catalogos(list(resultados.values()))
+
+
+def votos_candidato(df_agregado, candidato, coluna=None, ascending=None):
+    """Votos do candidato por ano (e por ``coluna``, se informada)"""
+    grupo = ['Ano', coluna] if coluna else ['Ano']
+    df = (
+        df_agregado
+        .filter(pl.col('Nome do candidato') == candidato)
+        .group_by(grupo)
+        .agg(pl.col('Votos').sum())
+    )
+    return df.sort(ascending or 'Ano', descending=True)
+
+
+def ranking_candidato(df_agregado, candidato, coluna, lista_anos):
+    """Votos do candidato por ``coluna`` somados nos anos escolhidos, do maior para o menor"""
+    return (
+        votos_candidato(df_agregado, candidato, coluna)
+        .filter(pl.col('Ano').is_in(lista_anos))
+        .group_by(coluna)
+        .agg(pl.col('Votos').sum())
+        .sort('Votos', descending=True)
+    )
+
+
+def coletar(consultas):
+    '''
+    Executar um dicionário de consultas lazy num único ``pl.collect_all``.
+    Leituras e subplanos comuns entre elas são feitos uma vez só.
+    '''
+    return dict(zip(consultas, pl.collect_all(list(consultas.values()))))
+
+
+def paineis_candidato(fatias, candidato, lista_anos):
+    '''
+    Evolução por ano e rankings por Bairro, Município e Cargo da página de
+    gráficos, executados juntos. ``fatias`` tem as linhas do candidato em
+    cada agregado, indexadas como ``AGREGADO_POR_COLUNA``; sem anos
+    escolhidos só a evolução é calculada.
+    '''
+    consultas = {None: votos_candidato(fatias[None].lazy(), candidato)}
+    if lista_anos:
+        for coluna in ('Bairro', 'Município', 'Cargo'):
+            consultas[coluna] = ranking_candidato(fatias[coluna].lazy(), candidato, coluna, lista_anos)
+    return coletar(consultas)
+
+
+def comparar_candidatos(df_candidato, df_bairro, df_municipio, candidatos, n=10):
+    '''
+    Tabelas da página de comparação para os candidatos escolhidos.
+    Retorna os votos por candidato, os ``n`` pares (candidato, bairro) mais
+    votados e a matriz partido x município restrita aos ``n`` maiores de cada.
+    As três saem de um único ``collect_all``; a soma por partido e município
+    é compartilhada entre a matriz e os dois rankings que a recortam.
+    '''
+    votos = df_candidato.lazy().filter(pl.col('Nome do candidato').is_in(candidatos)).select('Nome do candidato', 'Votos')
+    bairros = (
+        df_bairro.lazy()
+        .filter(pl.col('Nome do candidato').is_in(candidatos))
+        .sort('Votos', descending=True)
+        .head(n)
+    )
+    partidos = (
+        df_municipio.lazy()
+        .filter(pl.col('Nome do candidato').is_in(candidatos))
+        .group_by(['Sigla do partido', 'Município'])
+        .agg(pl.col('Votos').sum())
+    )
+    top_partidos = partidos.group_by('Sigla do partido').agg(pl.col('Votos').sum()).top_k(n, by='Votos').select('Sigla do partido')
+    top_municipios = partidos.group_by('Município').agg(pl.col('Votos').sum()).top_k(n, by='Votos').select('Município')
+    matriz = (
+        partidos
+        .join(top_partidos, on='Sigla do partido', how='semi')
+        .join(top_municipios, on='Município', how='semi')
+    )
+    resultado = coletar({'votos': votos, 'bairros': bairros, 'matriz': matriz})
+    return resultado['votos'], resultado['bairros'], resultado['matriz']
+
+
+def presenca_candidato(indice, nome_urna, sigla_estado):
+    """Linha [nome, Sim/Não por ano indexado] do candidato na UF, ou None se não aparecer"""
+    anos_presentes = indice.anos(nome_urna, sigla_estado)
+    if not anos_presentes:
+        return None
+    return [indice.nome_exibicao(nome_urna)] + ['Sim' if ano in anos_presentes else 'Não' for ano in indice.anos_indexados]
+
+
+def presenca_nacional(indice, nome_urna):
+    """Linhas [UF, Sim/Não por ano] para cada UF em que o nome aparece"""
+    ocorrencias = indice.ocorrencias(nome_urna)
+    linhas = []
+    for uf in estados:
+        anos_presentes = [ano for ano, sigla in ocorrencias if sigla == uf]
+        if anos_presentes:
+            linhas.append([uf] + ['Sim' if ano in anos_presentes else 'Não' for ano in indice.anos_indexados])
+    return linhas
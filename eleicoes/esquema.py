@@ -0,0 +1,34 @@
+"""
+Esquema canônico e compacto das tabelas de votação.
+
+As colunas de texto se repetem muito (mesmo bairro, município, cargo, partido
+e candidato em milhares de linhas), então são guardadas como ``Categorical``:
+cada valor distinto fica uma vez num dicionário global e as linhas guardam só
+um inteiro. ``Votos`` cabe em ``UInt32`` e ``Ano`` em ``Int16``. Com o
+dicionário global, concatenar anos e UFs diferentes não exige recodificação.
+"""
+
+import polars as pl
+
+from eleicoes.constantes import estados
+
+if not hasattr(pl, 'Categories'):
+    # Polars antigo: sem o cache global as categorias de cada arquivo seriam incompatíveis
+    pl.enable_string_cache()
+
+ESQUEMA = {
+    'Nome do candidato': pl.Categorical,
+    'Bairro': pl.Categorical,
+    'Município': pl.Categorical,
+    'Cargo': pl.Categorical,
+    'Sigla do partido': pl.Categorical,
+    'Votos': pl.UInt32,
+    'Ano': pl.Int16,
+    'UF': pl.Enum(list(estados)),
+}
+
+
+def aplicar_esquema(df):
+    """Converter as colunas presentes para os tipos do esquema canônico"""
+    colunas = df.collect_schema().names()
+    return df.with_columns([pl.col(col).cast(tipo) for col, tipo in ESQUEMA.items() if col in colunas])
@@ -0,0 +1,83 @@
+"""
+Exportação dos dados filtrados sem materializar o resultado inteiro.
+
+CSV.gz e Parquet são gravados direto da consulta lazy com ``sink_*``. O Excel
+é escrito pelo xlsxwriter em modo ``constant_memory``, consumindo a consulta
+em lotes e abrindo uma nova aba sempre que o limite de linhas do Excel é
+atingido. Em todos os casos o pico de memória depende do tamanho do lote, não
+do tamanho da exportação.
+"""
+
+import os
+import tempfile
+
+from eleicoes.metricas import etapa
+
+LIMITE_LINHAS_EXCEL = 1_048_576
+LINHAS_POR_LOTE = 50_000
+
+# Extensão -> (descrição, mime)
+FORMATOS = {
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv.gz': ('CSV compactado', 'application/gzip'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def exportar_excel(df, destino, linhas_por_aba=LIMITE_LINHAS_EXCEL - 1, tamanho_lote=LINHAS_POR_LOTE):
+    '''
+    Gravar a consulta em um .xlsx, dividindo em abas de ``linhas_por_aba``.
+    O cabeçalho ocupa a primeira linha de cada aba.
+    '''
+    import xlsxwriter
+
+    colunas = df.collect_schema().names()
+    with xlsxwriter.Workbook(destino, {'constant_memory': True}) as workbook:
+        aba = None
+        linha = linhas_por_aba
+        for lote in df.collect_batches(chunk_size=tamanho_lote):
+            for valores in lote.iter_rows():
+                if linha >= linhas_por_aba:
+                    aba = workbook.add_worksheet(f'Dados {len(workbook.worksheets()) + 1}')
+                    aba.write_row(0, 0, colunas)
+                    linha = 0
+                linha += 1
+                aba.write_row(linha, 0, valores)
+
+        if aba is None:
+            workbook.add_worksheet('Dados 1').write_row(0, 0, colunas)
+
+
+def exportar_csv_gz(df, destino):
+    df.sink_csv(destino, compression='gzip', check_extension=False)
+
+
+def exportar_parquet(df, destino):
+    df.sink_parquet(destino)
+
+
+EXPORTADORES = {
+    'xlsx': exportar_excel,
+    'csv.gz': exportar_csv_gz,
+    'parquet': exportar_parquet,
+}
+
+
+def exportar(df, formato, destino):
+    with etapa('exportacao', formato=formato):
+        EXPORTADORES[formato](df.lazy(), destino)
+
+
+def arquivo_para_download(df, formato):
+    '''
+    Exportar para um arquivo temporário e devolvê-lo aberto para leitura.
+    O arquivo é removido do disco logo após ser aberto; o conteúdo continua
+    acessível pelo handle até ele ser fechado.
+    '''
+    descritor, caminho = tempfile.mkstemp(suffix=f'.{formato}')
+    os.close(descritor)
+    try:
+        exportar(df, formato, caminho)
+        return open(caminho, 'rb')
+    finally:
+        os.unlink(caminho)
@@ -0,0 +1,339 @@
+"""
+Origem dos arquivos CSV.gz de cada (ano, UF).
+
+Por padrão os arquivos vêm do repositório HugoCDM/candidatos no GitHub e ficam
+guardados em um cache em disco endereçado por conteúdo (sha256), com limite de
+bytes e descarte LRU. ``ELEICOES_FONTE`` aceita outra URL base, um diretório
+local ou uma raiz ``file://``; nesses dois últimos casos os arquivos são lidos
+direto do espelho, sem passar pelo cache, e a aplicação roda offline.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from eleicoes.coalescencia import Coalescedor
+from eleicoes.configuracao import diretorio_dados, limite_cache_downloads, raiz_origem
+from eleicoes.constantes import nome_arquivo, url_arquivo
+from eleicoes.metricas import etapa, registrar_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: vale só a trava do processo
+    fcntl = None
+
+TAMANHO_BLOCO = 1024 * 1024
+# Segundos entre gravações do índice motivadas só por acertos
+INTERVALO_ACESSOS = 60
+
+
+def espelho_local(raiz=None):
+    """Diretório do espelho local, ou None se a origem for HTTP(S)"""
+    raiz = raiz or raiz_origem()
+    if raiz.startswith('file://'):
+        return Path(unquote(urlparse(raiz).path))
+    if '://' not in raiz:
+        return Path(raiz)
+    return None
+
+
+class CacheDownloads:
+    '''
+    Cache em disco dos arquivos baixados.
+    O índice guarda, para cada URL, o hash do conteúdo, o tamanho e o último
+    acesso; os objetos ficam em ``objetos/<sha256>``. Quando o total passa de
+    ``limite_bytes`` os objetos acessados há mais tempo são removidos.
+    Os acessos ficam em memória e vão para o índice junto com a próxima
+    gravação (um download ou um descarte), ou no máximo a cada
+    ``INTERVALO_ACESSOS`` segundos. O servidor e as linhas de comando (lote,
+    atualização) compartilham o diretório, então as gravações do índice
+    também tomam uma trava de arquivo.
+    '''
+
+    def __init__(self, diretorio, limite_bytes):
+        self.diretorio = Path(diretorio)
+        self.limite_bytes = limite_bytes
+        self._trava = threading.Lock()
+        self._voos = Coalescedor('downloads')
+        self._acessos = {}
+        self._gravado_em = time.monotonic()
+        self._limpar_reservas()
+
+    @contextmanager
+    def _travado(self):
+        """Trava do processo e, onde houver ``fcntl``, a trava de arquivo do diretório"""
+        with self._trava:
+            if fcntl is None:
+                yield
+                return
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            with open(self.diretorio / '.trava', 'w') as arquivo:
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+                yield
+
+    @property
+    def _caminho_indice(self):
+        return self.diretorio / 'indice.json'
+
+    def _objeto(self, sha256):
+        return self.diretorio / 'objetos' / sha256
+
+    def _ler_indice(self):
+        try:
+            return json.loads(self._caminho_indice.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _com_acessos(self, indice):
+        for url, instante in self._acessos.items():
+            if url in indice:
+                indice[url]['acesso'] = max(indice[url]['acesso'], instante)
+        self._acessos.clear()
+        return indice
+
+    def _gravar_indice(self, indice):
+        self._com_acessos(indice)
+        self._gravado_em = time.monotonic()
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        temporario = self._caminho_indice.with_name(f'.{uuid.uuid4().hex}.json')
+        temporario.write_text(json.dumps(indice, ensure_ascii=False), encoding='utf-8')
+        os.replace(temporario, self._caminho_indice)
+
+    def tamanho_total(self, indice=None):
+        indice = self._ler_indice() if indice is None else indice
+        objetos = {entrada['sha256']: entrada['tamanho'] for entrada in indice.values()}
+        return sum(objetos.values())
+
+    def _em_cache(self, url):
+        with self._travado():
+            entrada = self._ler_indice().get(url)
+            if entrada and self._objeto(entrada['sha256']).exists():
+                self._acessos[url] = time.time()
+                if time.monotonic() - self._gravado_em > INTERVALO_ACESSOS:
+                    self._gravar_indice(self._ler_indice())
+                return self._objeto(entrada['sha256'])
+        return None
+
+    def obter(self, url, **contexto):
+        '''
+        Caminho local do arquivo da URL, baixando apenas se não estiver em cache.
+        Pedidos simultâneos da mesma URL esperam um único download.
+        '''
+        caminho = self._em_cache(url)
+        if caminho is not None:
+            registrar_cache('downloads', acerto=True)
+            return caminho
+        return self._voos.executar(url, self._baixar_e_registrar, url, contexto)
+
+    @contextmanager
+    def reservar(self, url, **contexto):
+        '''
+        Caminho do arquivo da URL que continua válido até o fim do bloco,
+        mesmo que o objeto seja descartado do cache nesse meio-tempo por este
+        ou por outro processo. A reserva é um link físico para o objeto.
+        '''
+        reserva = self.diretorio / 'objetos' / f'.reserva-{os.getpid()}-{uuid.uuid4().hex}'
+        while True:
+            caminho = self.obter(url, **contexto)
+            try:
+                os.link(caminho, reserva)
+                break
+            except FileNotFoundError:
+                # Descartado entre a consulta e a reserva: procurar (ou baixar) de novo
+                continue
+        try:
+            yield reserva
+        finally:
+            reserva.unlink(missing_ok=True)
+
+    def _limpar_reservas(self):
+        """Remover reservas deixadas por processos que terminaram sem liberá-las"""
+        if os.name != 'posix':
+            return
+        for reserva in (self.diretorio / 'objetos').glob('.reserva-*'):
+            try:
+                os.kill(int(reserva.name.split('-')[1]), 0)
+            except ProcessLookupError:
+                reserva.unlink(missing_ok=True)
+            except (PermissionError, ValueError):
+                pass
+
+    def _baixar_e_registrar(self, url, contexto):
+        # Um download da mesma URL pode ter terminado entre a consulta ao índice e aqui
+        caminho = self._em_cache(url)
+        if caminho is not None:
+            return caminho
+
+        registrar_cache('downloads', acerto=False)
+        with etapa('download', url=url, **contexto) as medicao:
+            sha256, tamanho, temporario, validadores = self._baixar(url)
+            medicao['bytes'] = tamanho
+        return self._registrar(url, sha256, tamanho, temporario, validadores)
+
+    def validadores(self, url, sha256):
+        """ETag e Last-Modified da resposta que trouxe o conteúdo ``sha256`` da URL, se ainda estiverem no índice"""
+        with self._trava:
+            entrada = self._ler_indice().get(url)
+        if not entrada or entrada['sha256'] != sha256:
+            return {}
+        return {chave: entrada[chave] for chave in ('etag', 'last_modified') if entrada.get(chave)}
+
+    def revalidar(self, url, gravado=None, **contexto):
+        '''
+        Conferir com a origem se o arquivo da URL mudou e devolver o sha256 atual.
+        ``gravado`` é ``(sha256, validadores)`` do conteúdo já usado, guardado
+        por quem o consumiu, para que a revalidação continue possível depois
+        que o arquivo sai do cache; o índice só é preferido quando guarda o
+        mesmo conteúdo. A requisição leva o ETag e o Last-Modified; com a
+        resposta 304 nada é baixado. Sem validadores o arquivo é baixado de
+        novo e a comparação fica por conta do hash do conteúdo.
+        '''
+        with self._trava:
+            entrada = self._ler_indice().get(url)
+        sha256, validadores = gravado or (None, {})
+        if entrada and self._objeto(entrada['sha256']).exists() and (not validadores or entrada['sha256'] == sha256):
+            sha256, validadores = entrada['sha256'], entrada
+        condicionais = {}
+        if validadores.get('etag'):
+            condicionais['If-None-Match'] = validadores['etag']
+        if validadores.get('last_modified'):
+            condicionais['If-Modified-Since'] = validadores['last_modified']
+
+        with etapa('revalidacao', url=url, **contexto) as medicao:
+            baixado = self._baixar(url, condicionais)
+            medicao['bytes'] = 0 if baixado is None else baixado[1]
+        if baixado is None:
+            # 304: o conteúdo conhecido continua valendo
+            self._em_cache(url)
+            return sha256
+        self._registrar(url, *baixado)
+        return baixado[0]
+
+    def _registrar(self, url, sha256, tamanho, temporario, validadores):
+        with self._travado():
+            destino = self._objeto(sha256)
+            if destino.exists():
+                temporario.unlink(missing_ok=True)
+            else:
+                os.replace(temporario, destino)
+
+            # Acessos pendentes entram antes do descarte, que escolhe pelos mais antigos
+            indice = self._com_acessos(self._ler_indice())
+            indice[url] = {'sha256': sha256, 'tamanho': tamanho, 'acesso': time.time(), **validadores}
+            self._descartar(indice, manter=url)
+            self._gravar_indice(indice)
+            return destino
+
+    def _baixar(self, url, condicionais=None):
+        '''
+        Baixar a URL para um arquivo temporário.
+        Retorna ``(sha256, tamanho, temporário, validadores)``, ou None se a
+        origem responder 304 aos cabeçalhos ``condicionais``.
+        '''
+        # Só necessário com origem HTTP; espelhos locais não pagam a importação
+        import requests
+
+        pasta = self.diretorio / 'objetos'
+        pasta.mkdir(parents=True, exist_ok=True)
+        temporario = pasta / f'.{uuid.uuid4().hex}.parcial'
+        resumo = hashlib.sha256()
+        tamanho = 0
+        try:
+            with requests.get(url, headers=condicionais, stream=True, timeout=60) as resposta:
+                if resposta.status_code == 304:
+                    return None
+                if resposta.status_code == 404:
+                    raise FileNotFoundError(url)
+                resposta.raise_for_status()
+                validadores = {
+                    'etag': resposta.headers.get('ETag'),
+                    'last_modified': resposta.headers.get('Last-Modified'),
+                }
+                with open(temporario, 'wb') as arquivo:
+                    for bloco in resposta.iter_content(TAMANHO_BLOCO):
+                        resumo.update(bloco)
+                        arquivo.write(bloco)
+                        tamanho += len(bloco)
+        except BaseException:
+            temporario.unlink(missing_ok=True)
+            raise
+        return resumo.hexdigest(), tamanho, temporario, validadores
+
+    def _descartar(self, indice, manter=None):
+        por_acesso = sorted(
+            (url for url in indice if url != manter),
+            key=lambda url: indice[url]['acesso'],
+        )
+        while self.tamanho_total(indice) > self.limite_bytes and por_acesso:
+            entrada = indice.pop(por_acesso.pop(0))
+            if not any(outra['sha256'] == entrada['sha256'] for outra in indice.values()):
+                self._objeto(entrada['sha256']).unlink(missing_ok=True)
+
+
+_cache = None
+_trava_cache = threading.Lock()
+
+
+def cache_downloads():
+    """Cache compartilhado pelo processo (limite em ELEICOES_CACHE_MAX_BYTES)"""
+    global _cache
+    with _trava_cache:
+        if _cache is None:
+            _cache = CacheDownloads(diretorio_dados() / 'downloads', limite_cache_downloads())
+        return _cache
+
+
+def sha256_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def sha256_origem(ano, sigla_estado, gravado=None):
+    '''
+    Hash do conteúdo atual do CSV.gz de um (ano, UF) na origem.
+    Espelhos locais são relidos; com origem HTTP o conteúdo conhecido é
+    revalidado pelo ETag/Last-Modified antes de qualquer download.
+    ``gravado`` é ``(sha256, validadores)`` da última ingestão.
+    '''
+    raiz = raiz_origem()
+    if espelho_local(raiz) is not None:
+        with reservar_origem(ano, sigla_estado) as caminho:
+            return sha256_arquivo(caminho)
+    return cache_downloads().revalidar(url_arquivo(ano, sigla_estado, raiz), gravado, uf=sigla_estado.upper(), ano=ano)
+
+
+def validadores_origem(ano, sigla_estado, sha256):
+    """ETag e Last-Modified do CSV.gz com conteúdo ``sha256`` (vazio para espelhos locais)"""
+    raiz = raiz_origem()
+    if espelho_local(raiz) is not None:
+        return {}
+    return cache_downloads().validadores(url_arquivo(ano, sigla_estado, raiz), sha256)
+
+
+@contextmanager
+def reservar_origem(ano, sigla_estado):
+    '''
+    Caminho local do CSV.gz de um (ano, UF), válido até o fim do bloco.
+    Lê do espelho local quando configurado, senão baixa pelo cache em disco
+    e reserva o objeto, para que um descarte não o apague durante a leitura.
+    '''
+    raiz = raiz_origem()
+    espelho = espelho_local(raiz)
+    if espelho is not None:
+        caminho = espelho / nome_arquivo(ano, sigla_estado)
+        if not caminho.exists():
+            raise FileNotFoundError(caminho)
+        yield caminho
+        return
+
+    with cache_downloads().reservar(url_arquivo(ano, sigla_estado, raiz), uf=sigla_estado.upper(), ano=ano) as caminho:
+        yield caminho
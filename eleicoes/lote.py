@@ -0,0 +1,190 @@
+"""
+Exportação em lote, sem Streamlit.
+
+Lê um arquivo de tarefas (uma lista JSON ou um objeto JSON por linha), cada uma
+com os mesmos filtros da página de geração::
+
+    {"anos": [2024, 2022], "ufs": ["RJ"], "municipio": ["NITERÓI"],
+     "partido": [], "candidato": [], "bairro": [], "formatos": ["xlsx", "parquet"]}
+
+e grava os arquivos com os nomes que a página daria ao download. As
+partições usadas são ingeridas uma única vez antes de começar; depois as
+tarefas que usam o mesmo conjunto de (ano, UF) vão juntas para o mesmo
+processo do pool, que mantém seu próprio registro de partições em memória;
+grupos com muitas tarefas são repartidos entre os processos livres.
+
+Uso:
+    python -m eleicoes.lote TAREFAS.json [--saida DIRETORIO] [--processos N]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import polars as pl
+
+from eleicoes.armazenamento import ingerir_particao
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.configuracao import limite_registro
+from eleicoes.constantes import estados
+from eleicoes.consultas import filtrar_votos, nome_exportacao
+from eleicoes.exportacao import FORMATOS, exportar
+from eleicoes.registro import RegistroParticoes
+
+FILTROS = ('bairro', 'municipio', 'candidato', 'partido')
+CAMPOS = {'anos', 'ufs', 'formatos', 'nome', *FILTROS}
+
+_registro = None
+
+
+def ler_tarefas(caminho):
+    '''
+    Tarefas do arquivo, validadas e com os valores padrão preenchidos.
+    Anos viram texto (como na página) e UFs ficam em maiúsculas.
+    '''
+    texto = Path(caminho).read_text(encoding='utf-8')
+    if texto.lstrip().startswith('['):
+        brutas = json.loads(texto)
+    else:
+        brutas = [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+
+    tarefas = []
+    for numero, bruta in enumerate(brutas, start=1):
+        desconhecidos = set(bruta) - CAMPOS
+        if desconhecidos:
+            raise ValueError(f'Tarefa {numero}: campos desconhecidos {sorted(desconhecidos)}')
+        if not bruta.get('anos') or not bruta.get('ufs'):
+            raise ValueError(f'Tarefa {numero}: "anos" e "ufs" são obrigatórios')
+
+        tarefa = {
+            'anos': sorted(str(ano) for ano in bruta['anos']),
+            'ufs': [sigla.upper() for sigla in bruta['ufs']],
+            'formatos': bruta.get('formatos') or ['xlsx'],
+            'nome': bruta.get('nome'),
+            **{filtro: bruta.get(filtro) or '' for filtro in FILTROS},
+        }
+        invalidas = [sigla for sigla in tarefa['ufs'] if sigla not in estados]
+        formatos = [formato for formato in tarefa['formatos'] if formato not in FORMATOS]
+        if invalidas or formatos:
+            raise ValueError(f'Tarefa {numero}: UF ou formato inválido {invalidas + formatos}')
+        tarefas.append(tarefa)
+    return tarefas
+
+
+def particoes_tarefa(tarefa):
+    return tuple((int(ano), sigla_estado) for ano in tarefa['anos'] for sigla_estado in tarefa['ufs'])
+
+
+def _iniciar_processo():
+    global _registro
+    _registro = RegistroParticoes(limite_registro())
+
+
+def executar_tarefa(tarefa, saida):
+    '''
+    Exportar uma tarefa nos formatos pedidos.
+    Partições sem arquivo são ignoradas, como na página; se nenhuma existir
+    a tarefa falha. Retorna os caminhos gravados.
+    '''
+    registro = _registro or RegistroParticoes(limite_registro())
+    filtros = {filtro: tarefa[filtro] for filtro in FILTROS}
+
+    consultas = []
+    for ano, sigla_estado in particoes_tarefa(tarefa):
+        try:
+            df = registro.scan(ano, sigla_estado)
+        except FileNotFoundError:
+            continue
+        consultas.append(filtrar_votos(df, ano, sigla_estado, **filtros))
+    if not consultas:
+        raise FileNotFoundError(f"Nenhum arquivo para {tarefa['anos']} {tarefa['ufs']}")
+    consulta = pl.concat(consultas)
+
+    gravados = []
+    for formato in tarefa['formatos']:
+        if tarefa['nome']:
+            nome = f"{tarefa['nome']}.{formato}"
+        else:
+            nome = nome_exportacao(tarefa['anos'], ' e '.join(tarefa['ufs']), extensao=formato, **filtros)
+        destino = Path(saida) / nome.replace(os.sep, '-')
+        exportar(consulta, formato, destino)
+        gravados.append(destino)
+    return gravados
+
+
+def _executar_grupo(tarefas, saida):
+    resultados = []
+    for indice, tarefa in tarefas:
+        try:
+            resultados.append((indice, executar_tarefa(tarefa, saida), None))
+        except Exception as e:
+            resultados.append((indice, None, f'{type(e).__name__}: {e}'))
+    return resultados
+
+
+def executar_lote(tarefas, saida, processos=None):
+    '''
+    Executar as tarefas num pool de processos.
+    Retorna ``{índice da tarefa: (arquivos gravados, erro)}``.
+    '''
+    saida = Path(saida)
+    saida.mkdir(parents=True, exist_ok=True)
+
+    # Download e conversão para Parquet acontecem uma vez, no processo principal
+    necessarias = sorted({particao for tarefa in tarefas for particao in particoes_tarefa(tarefa)})
+    carregar_particoes(necessarias, ingerir_particao)
+
+    grupos = defaultdict(list)
+    for indice, tarefa in enumerate(tarefas):
+        grupos[particoes_tarefa(tarefa)].append((indice, tarefa))
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas)) or 1
+    # Grupos grandes são divididos em fatias proporcionais ao seu tamanho, para
+    # que muitas tarefas sobre as mesmas partições não fiquem num só processo
+    fatias = []
+    for grupo in grupos.values():
+        partes = min(len(grupo), -(-len(grupo) * processos // len(tarefas)))
+        tamanho = -(-len(grupo) // partes)
+        fatias += [grupo[i:i + tamanho] for i in range(0, len(grupo), tamanho)]
+    # Cada processo usa uma fatia dos núcleos, em vez de todos disputarem todos
+    os.environ.setdefault('POLARS_MAX_THREADS', str(max(1, (os.cpu_count() or 1) // processos)))
+
+    resultados = {}
+    with ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_iniciar_processo,
+    ) as executor:
+        futuros = [executor.submit(_executar_grupo, fatia, saida) for fatia in fatias]
+        for futuro in as_completed(futuros):
+            for indice, gravados, erro in futuro.result():
+                resultados[indice] = (gravados, erro)
+    return dict(sorted(resultados.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Exportação em lote dos dados dos candidatos')
+    parser.add_argument('tarefas', help='arquivo JSON (lista) ou JSON Lines com as tarefas')
+    parser.add_argument('--saida', default='exportacoes', help='diretório dos arquivos gerados')
+    parser.add_argument('--processos', type=int, default=None, help='processos em paralelo (padrão: núcleos)')
+    args = parser.parse_args(argv)
+
+    tarefas = ler_tarefas(args.tarefas)
+    falhas = 0
+    for indice, (gravados, erro) in executar_lote(tarefas, args.saida, args.processos).items():
+        if erro:
+            falhas += 1
+            print(f'Tarefa {indice + 1}: ERRO {erro}')
+        else:
+            for caminho in gravados:
+                print(f'Tarefa {indice + 1}: {caminho}')
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Medições leves do caminho crítico das páginas.
+
+``etapa(nome, **contexto)`` cronometra um trecho (download, ingestão, leitura
+do Parquet, agregação, agrupamento, conversão para pandas, montagem dos
+gráficos) e ``registrar_cache(nome, acerto)`` conta acertos e faltas de cada
+carregador com cache. Cada medição vira uma linha JSON no logger
+``eleicoes.metricas`` e fica numa janela em memória do processo, de onde
+``resumo_etapas`` tira contagem, mediana, p95 e máximo por etapa (e, se
+pedido, por UF e ano).
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import polars as pl
+
+from eleicoes.configuracao import log_metricas
+
+# Quantidade de medições guardadas para os percentis
+JANELA = 5_000
+
+logger = logging.getLogger('eleicoes.metricas')
+
+_trava = threading.Lock()
+_medicoes = deque(maxlen=JANELA)
+_caches = defaultdict(lambda: {'acertos': 0, 'faltas': 0})
+_log_configurado = False
+
+
+def _configurar_log():
+    global _log_configurado
+    _log_configurado = True
+    destino = log_metricas()
+    if not destino:
+        return
+    handler = logging.StreamHandler(sys.stderr) if destino == '-' else logging.FileHandler(destino, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def _emitir(registro):
+    if not _log_configurado:
+        with _trava:
+            if not _log_configurado:
+                _configurar_log()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def etapa(nome, **contexto):
+    '''
+    Cronometrar o bloco como a etapa ``nome``.
+    ``contexto`` (por exemplo ``uf`` e ``ano``) acompanha a medição; o
+    dicionário é devolvido pelo ``with`` para que o bloco acrescente campos,
+    como a quantidade de linhas produzidas.
+    '''
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        yield contexto
+    except BaseException as e:
+        erro = type(e).__name__
+        raise
+    finally:
+        registro = {'etapa': nome, 'segundos': time.perf_counter() - inicio, 'instante': time.time(), **contexto}
+        if erro:
+            registro['erro'] = erro
+        with _trava:
+            _medicoes.append(registro)
+        _emitir(registro)
+
+
+def registrar_cache(nome, acerto):
+    """Contar um acerto ou uma falta do cache ``nome``"""
+    with _trava:
+        _caches[nome]['acertos' if acerto else 'faltas'] += 1
+    _emitir({'cache': nome, 'acerto': acerto, 'instante': time.time()})
+
+
+def resumo_etapas(por=('etapa',)):
+    """Contagem, total, mediana, p95 e máximo dos segundos de cada grupo ``por``"""
+    with _trava:
+        medicoes = list(_medicoes)
+    colunas = list(por)
+    if not medicoes:
+        return pl.DataFrame(schema={**{col: pl.String for col in colunas}, 'segundos': pl.Float64})
+
+    df = pl.DataFrame(
+        [{col: None if m.get(col) is None else str(m[col]) for col in colunas} | {'segundos': m['segundos']} for m in medicoes],
+        schema={**{col: pl.String for col in colunas}, 'segundos': pl.Float64},
+    )
+    return (
+        df.group_by(colunas)
+        .agg(
+            pl.len().alias('contagem'),
+            pl.col('segundos').sum().alias('total'),
+            pl.col('segundos').median().alias('p50'),
+            pl.col('segundos').quantile(0.95, interpolation='linear').alias('p95'),
+            pl.col('segundos').max().alias('max'),
+        )
+        .sort('total', descending=True)
+    )
+
+
+def resumo_caches():
+    """Acertos, faltas e taxa de acerto de cada cache"""
+    with _trava:
+        caches = {nome: dict(contagem) for nome, contagem in _caches.items()}
+    for contagem in caches.values():
+        total = contagem['acertos'] + contagem['faltas']
+        contagem['taxa_acerto'] = contagem['acertos'] / total if total else 0.0
+    return caches
+
+
+def limpar():
+    with _trava:
+        _medicoes.clear()
+        _caches.clear()
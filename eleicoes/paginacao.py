@@ -0,0 +1,134 @@
+"""
+Paginação de resultados no servidor.
+
+Uma exportação de vários anos de uma UF grande tem milhões de linhas, e
+mandar tudo para o navegador custa mais do que calcular. Aqui o resultado
+continua uma consulta lazy: filtros por coluna viram expressões do polars, e
+só a página visível é materializada. Uma página ordenada sai de um
+``bottom_k`` sobre uma chave inteira por linha, em vez de ordenar o
+resultado inteiro a cada troca de página. O resumo das colunas fica em
+agregados baratos (nulos e, nas colunas numéricas, mínimo, máximo e soma),
+que o motor de streaming calcula sem materializar a seleção.
+"""
+
+import polars as pl
+
+LINHAS_POR_PAGINA = 100
+# Posições de linha cabem abaixo deste limite na chave de ordenação
+LIMITE_LINHAS = 1 << 32
+
+
+def filtrar_colunas(consulta, filtros):
+    '''
+    Manter as linhas em que cada coluna de ``filtros`` contém o texto pedido.
+    A comparação ignora maiúsculas; textos vazios são ignorados.
+    '''
+    for coluna, texto in (filtros or {}).items():
+        if texto:
+            consulta = consulta.filter(
+                pl.col(coluna).cast(pl.String).str.to_lowercase().str.contains(texto.lower(), literal=True)
+            )
+    return consulta
+
+
+def _posicoes_ordenadas(consulta, ordem, decrescente, quantidade, engine):
+    '''
+    Posições, na ordem original, das ``quantidade`` primeiras linhas ordenadas
+    por ``ordem``. Cada linha vira uma única chave inteira: o posto do valor
+    entre os distintos (nulos no fim) seguido da posição da linha, que
+    desempata. O ``bottom_k`` dessa chave roda em streaming sem guardar as
+    colunas da seleção, que nunca é ordenada inteira.
+    '''
+    distintos = consulta.select(pl.col(ordem).unique().drop_nulls()).collect(engine=engine).to_series()
+    distintos = distintos.sort(descending=decrescente)
+    postos = pl.LazyFrame({ordem: distintos, '__posto': pl.int_range(len(distintos), dtype=pl.UInt64, eager=True)})
+    chaves = (
+        consulta.with_row_index('__posicao')
+        .select(ordem, '__posicao')
+        .join(postos, on=ordem, how='left')
+        .select((pl.col('__posto').fill_null(len(distintos)) * LIMITE_LINHAS + pl.col('__posicao').cast(pl.UInt64)).alias('__chave'))
+        .bottom_k(quantidade, by='__chave')
+        .collect(engine=engine)
+        .get_column('__chave')
+        .sort()
+    )
+    return (chaves % LIMITE_LINHAS).cast(pl.get_index_type())
+
+
+def pagina(consulta, numero, linhas_por_pagina=LINHAS_POR_PAGINA, ordem=None, decrescente=False, engine='auto'):
+    '''
+    Linhas da página ``numero`` (a partir de 0). Com ``ordem``, nulos vão
+    para o fim e empates mantêm a ordem original.
+    '''
+    inicio = numero * linhas_por_pagina
+    if not ordem:
+        return consulta.slice(inicio, linhas_por_pagina).collect(engine=engine)
+    posicoes = _posicoes_ordenadas(consulta, ordem, decrescente, inicio + linhas_por_pagina, engine).slice(inicio)
+    linhas = consulta.with_row_index('__posicao').filter(pl.col('__posicao').is_in(posicoes)).collect(engine=engine)
+    return (
+        posicoes.to_frame('__posicao')
+        .join(linhas, on='__posicao', how='left', maintain_order='left')
+        .drop('__posicao')
+    )
+
+
+def total_paginas(linhas, linhas_por_pagina=LINHAS_POR_PAGINA):
+    return max(1, -(-linhas // linhas_por_pagina))
+
+
+def _consulta_resumo(consulta, esquema):
+    expressoes = [pl.len().alias('__linhas')]
+    for coluna, tipo in esquema.items():
+        expressoes.append(pl.col(coluna).null_count().alias(f'{coluna}__nulos'))
+        if tipo.is_numeric():
+            expressoes += [
+                pl.col(coluna).min().alias(f'{coluna}__minimo'),
+                pl.col(coluna).max().alias(f'{coluna}__maximo'),
+                pl.col(coluna).cast(pl.Int64 if tipo.is_integer() else pl.Float64).sum().alias(f'{coluna}__soma'),
+            ]
+    return consulta.select(expressoes)
+
+
+def _texto(valor):
+    return None if valor is None else str(valor)
+
+
+def _tabela_resumo(df, esquema):
+    linha = df.row(0, named=True)
+    resumo = pl.DataFrame(
+        [
+            {
+                'Coluna': coluna,
+                'Tipo': str(tipo),
+                'Nulos': linha[f'{coluna}__nulos'],
+                'Mínimo': _texto(linha.get(f'{coluna}__minimo')),
+                'Máximo': _texto(linha.get(f'{coluna}__maximo')),
+                'Soma': linha.get(f'{coluna}__soma'),
+            }
+            for coluna, tipo in esquema.items()
+        ],
+        schema={
+            'Coluna': pl.String, 'Tipo': pl.String, 'Nulos': pl.UInt32,
+            'Mínimo': pl.String, 'Máximo': pl.String, 'Soma': pl.Float64,
+        },
+    )
+    return linha['__linhas'], resumo
+
+
+def pagina_e_resumo(consulta, numero, linhas_por_pagina=LINHAS_POR_PAGINA, ordem=None, decrescente=False, engine='auto'):
+    '''
+    Página ``numero``, total de linhas e resumo das colunas. Sem ordenação a
+    fatia e o resumo saem num único ``collect_all``, compartilhando a
+    leitura e os filtros. Retorna ``(pagina, total, resumo)``.
+    '''
+    esquema = consulta.collect_schema()
+    if ordem:
+        # A página ordenada precisa de passadas próprias (distintos e chaves)
+        df_pagina = pagina(consulta, numero, linhas_por_pagina, ordem, decrescente, engine)
+        df_resumo = _consulta_resumo(consulta, esquema).collect(engine=engine)
+    else:
+        df_pagina, df_resumo = pl.collect_all(
+            [consulta.slice(numero * linhas_por_pagina, linhas_por_pagina), _consulta_resumo(consulta, esquema)],
+            engine=engine,
+        )
+    return (df_pagina, *_tabela_resumo(df_resumo, esquema))
@@ -0,0 +1,167 @@
+"""Recursos compartilhados entre as páginas do Streamlit."""
+
+import functools
+import threading
+
+import streamlit as st
+
+from eleicoes import metricas, paginacao
+from eleicoes.antecipacao import Antecipador
+from eleicoes.configuracao import depuracao, limite_registro, threads_antecipacao
+from eleicoes.registro import RegistroParticoes
+
+_execucoes = threading.local()
+
+
+@st.cache_resource
+def registro():
+    """Registro de partições único para todas as sessões e páginas do processo"""
+    return RegistroParticoes(limite_registro())
+
+
+@st.cache_resource
+def antecipador():
+    """Pool de antecipação único do processo, limitado por ELEICOES_ANTECIPACAO"""
+    return Antecipador(registro(), threads_antecipacao())
+
+
+def antecipar(siglas, alvo='particoes'):
+    '''
+    Aquecer em segundo plano o que a página consome das UFs selecionadas:
+    as partições no registro (``'particoes'``), os agregados por candidato
+    (``'agregados'``) ou os índices de presença e de busca (``'presenca'``).
+    Cada sessão guarda o seu pedido; se a seleção ou a página mudar, o
+    anterior é cancelado e um novo é agendado. Repetir a mesma seleção não faz nada.
+    '''
+    if not threads_antecipacao():
+        return
+    siglas = tuple(sorted(sigla_estado.upper() for sigla_estado in siglas))
+    anterior = st.session_state.get('_antecipacao')
+    if anterior is not None:
+        if (anterior.siglas, anterior.alvo) == (siglas, alvo):
+            return
+        anterior.cancelar()
+    st.session_state['_antecipacao'] = antecipador().antecipar(siglas, alvo) if siglas else None
+
+
+def cache_data(funcao):
+    '''
+    ``st.cache_data`` contando acertos e faltas em ``eleicoes.metricas``.
+    O corpo da função só roda numa falta; cada execução é contada por
+    thread, e uma chamada em que o contador não andou foi um acerto.
+    '''
+    nome = funcao.__qualname__
+
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        contagem = vars(_execucoes)
+        contagem[nome] = contagem.get(nome, 0) + 1
+        with metricas.etapa(nome):
+            return funcao(*args, **kwargs)
+
+    em_cache = st.cache_data(executar)
+
+    @functools.wraps(funcao)
+    def chamar(*args, **kwargs):
+        antes = vars(_execucoes).get(nome, 0)
+        resultado = em_cache(*args, **kwargs)
+        metricas.registrar_cache(nome, acerto=vars(_execucoes).get(nome, 0) == antes)
+        return resultado
+
+    chamar.clear = em_cache.clear
+    return chamar
+
+
+def _voltar_primeira_pagina(chave):
+    st.session_state[f'{chave}_pagina'] = 1
+
+
+def tabela_paginada(consulta, chave, assinatura, linhas_por_pagina=paginacao.LINHAS_POR_PAGINA, column_config=None, streaming=False):
+    '''
+    Tabela de uma consulta lazy, paginada no servidor.
+    Só a página visível vai para o navegador; ordenação e filtros por coluna
+    são feitos pelo polars. ``assinatura`` identifica o resultado: enquanto
+    ela e os filtros não mudam, total e resumo das colunas são reaproveitados
+    da sessão e trocar de página ou de ordenação lê apenas a fatia nova.
+    Com ``streaming`` as leituras usam o motor de streaming, sem
+    materializar a seleção. Retorna o total de linhas e o resumo das colunas
+    após os filtros.
+    '''
+    colunas = consulta.collect_schema().names()
+    voltar = {'on_change': _voltar_primeira_pagina, 'args': (chave,)}
+    engine = 'streaming' if streaming else 'auto'
+
+    with st.expander('Ordenar e filtrar'):
+        coluna_ordem, coluna_sentido = st.columns([3, 1])
+        ordem = coluna_ordem.selectbox('Ordenar por', [None] + colunas, format_func=lambda c: c or '(ordem original)', key=f'{chave}_ordem', **voltar)
+        decrescente = coluna_sentido.toggle('Decrescente', key=f'{chave}_decrescente', **voltar)
+        filtradas = st.multiselect('Filtrar colunas', colunas, key=f'{chave}_filtradas', **voltar)
+        filtros = {
+            coluna: st.text_input(f'{coluna} contém', key=f'{chave}_filtro_{coluna}', **voltar)
+            for coluna in filtradas
+        }
+
+    consulta = paginacao.filtrar_colunas(consulta, filtros)
+    chave_pagina = f'{chave}_pagina'
+    estado = (assinatura, tuple(sorted(filtros.items())))
+    memoria = st.session_state.get(f'{chave}_resumo')
+    with metricas.etapa('pagina_tabela', streaming=streaming) as medicao:
+        if memoria is None or memoria[0] != estado:
+            # Resultado novo começa na primeira página, lida junto com o resumo
+            _voltar_primeira_pagina(chave)
+            df, total, resumo = paginacao.pagina_e_resumo(consulta, 0, linhas_por_pagina, ordem, decrescente, engine)
+            memoria = st.session_state[f'{chave}_resumo'] = (estado, total, resumo)
+            medicao['resumo'] = True
+        else:
+            _, total, resumo = memoria
+            numero = min(st.session_state.get(chave_pagina, 1), paginacao.total_paginas(total, linhas_por_pagina))
+            df = paginacao.pagina(consulta, numero - 1, linhas_por_pagina, ordem, decrescente, engine)
+
+    st.dataframe(df, hide_index=True, width='stretch', column_config=column_config)
+    paginas = paginacao.total_paginas(total, linhas_por_pagina)
+    if st.session_state.get(chave_pagina, 1) > paginas:
+        _voltar_primeira_pagina(chave)
+    numero = st.number_input('Página', min_value=1, max_value=paginas, step=1, key=chave_pagina)
+    inicio = (numero - 1) * linhas_por_pagina
+    st.caption(
+        f'Linhas {min(inicio + 1, total):,} a {inicio + df.height:,} de {total:,} (página {numero} de {paginas})'.replace(',', '.')
+    )
+
+    with st.expander('Resumo das colunas'):
+        st.dataframe(resumo, hide_index=True, width='stretch')
+    return total, resumo
+
+
+def painel_metricas():
+    '''
+    Painel de métricas na barra lateral.
+    Aparece com ``ELEICOES_DEPURACAO=1`` ou com ``?depuracao=1`` na URL e
+    mostra as medições acumuladas pelo processo até a execução anterior.
+    '''
+    if not (depuracao() or st.query_params.get('depuracao') == '1'):
+        return
+
+    with st.sidebar.expander('Métricas de desempenho', expanded=True):
+        por_particao = st.toggle('Por UF e ano')
+        etapas = metricas.resumo_etapas(('etapa', 'uf', 'ano') if por_particao else ('etapa',))
+        st.dataframe(etapas, hide_index=True, width='stretch')
+
+        caches = metricas.resumo_caches()
+        if caches:
+            st.dataframe(
+                [{'cache': nome, **contagem} for nome, contagem in sorted(caches.items())],
+                hide_index=True,
+                width='stretch',
+            )
+
+        estatisticas = registro().estatisticas()
+        st.caption(
+            f"Registro: {estatisticas['particoes']} partições, "
+            f"{estatisticas['bytes'] / 1024 ** 2:,.1f} de {estatisticas['limite_bytes'] / 1024 ** 2:,.0f} MB, "
+            f"{estatisticas['descartes']} descartes"
+        )
+        if threads_antecipacao():
+            antecipacao = antecipador().estatisticas()
+            st.caption('Antecipação: ' + ', '.join(f'{quantidade} {nome}' for nome, quantidade in antecipacao.items()))
+        if st.button('Zerar métricas'):
+            metricas.limpar()
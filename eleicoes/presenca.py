@@ -0,0 +1,273 @@
+"""
+Índice invertido de presença dos candidatos por (ano, UF).
+
+Para cada nome normalizado (maiúsculo, sem acentos e com espaços únicos) o
+índice guarda, para cada ano, uma máscara de 27 bits com as UFs em que o nome
+apareceu (bit ``i`` = i-ésima UF de ``estados``), numa coluna por ano; um ano
+novo ganha sua coluna ao ser aplicado. O índice é atualizado uma
+vez por partição ingerida e persistido em ``indices/presenca.parquet``, então
+perguntar em quais anos e UFs um nome aparece vira uma consulta em dicionário.
+"""
+
+import json
+import os
+import threading
+import unicodedata
+import uuid
+
+import polars as pl
+
+from eleicoes.armazenamento import anos_disponiveis, caminho_particao, particao_em_dia, scan_particao
+from eleicoes.canonizacao import canonico
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.configuracao import diretorio_dados
+from eleicoes.constantes import anos, estados
+from eleicoes.metricas import etapa, registrar_cache
+
+UFS = list(estados)
+
+
+def bit_uf(sigla_estado):
+    return 1 << UFS.index(sigla_estado.upper())
+
+
+def normalizar_nome(nome):
+    """Chave de busca de um nome: canônico (com os apelidos aplicados) e sem acentos"""
+    nome = unicodedata.normalize('NFKD', canonico(nome))
+    return ''.join(c for c in nome if not unicodedata.combining(c))
+
+
+def expr_normalizar_nome(coluna='Nome do candidato'):
+    """Mesma normalização de ``normalizar_nome`` para nomes já canonizados na ingestão"""
+    return (
+        pl.col(coluna)
+        .str.normalize('NFKD')
+        .str.replace_all(r'\p{Mn}', '')
+        .str.to_uppercase()
+        .str.replace_all(r'\s+', ' ')
+        .str.strip_chars()
+    )
+
+
+def caminho_indice():
+    return diretorio_dados() / 'indices' / 'presenca.parquet'
+
+
+def caminho_cobertura():
+    return diretorio_dados() / 'indices' / 'presenca_cobertura.json'
+
+
+def _vazio():
+    return pl.DataFrame(schema={'nome': pl.String, 'Nome do candidato': pl.String} | {str(ano): pl.UInt32 for ano in anos})
+
+
+def _anos_tabela(df):
+    return sorted(int(coluna) for coluna in df.columns if coluna.isdigit())
+
+
+class IndicePresenca:
+    '''
+    Índice carregado em memória.
+    ``df`` é a tabela persistida; as consultas por nome usam um dicionário
+    nome normalizado -> posição da linha. ``anos_indexados`` são os anos com
+    coluna na tabela.
+    '''
+
+    def __init__(self, df):
+        self.df = df
+        self.anos_indexados = _anos_tabela(df)
+        self._linhas = {nome: i for i, nome in enumerate(df['nome'].to_list())}
+        self._mascaras = {ano: df[str(ano)].to_list() for ano in self.anos_indexados}
+        self._exibicao = df['Nome do candidato'].to_list()
+
+    def __len__(self):
+        return len(self._linhas)
+
+    def __contains__(self, nome):
+        return normalizar_nome(nome) in self._linhas
+
+    def mascara(self, nome, ano):
+        linha = self._linhas.get(normalizar_nome(nome))
+        if linha is None or ano not in self._mascaras:
+            return 0
+        return self._mascaras[ano][linha]
+
+    def nome_exibicao(self, nome):
+        linha = self._linhas.get(normalizar_nome(nome))
+        return None if linha is None else self._exibicao[linha]
+
+    def anos(self, nome, sigla_estado):
+        """Anos em que o nome aparece nas urnas da UF"""
+        bit = bit_uf(sigla_estado)
+        return [ano for ano in self.anos_indexados if self.mascara(nome, ano) & bit]
+
+    def ocorrencias(self, nome):
+        """Todos os (ano, UF) em que o nome aparece"""
+        return [
+            (ano, sigla_estado)
+            for ano in self.anos_indexados
+            for sigla_estado in UFS
+            if self.mascara(nome, ano) & bit_uf(sigla_estado)
+        ]
+
+    def nomes(self, sigla_estado):
+        """Nomes de exibição presentes na UF em qualquer ano, em ordem alfabética"""
+        bit = bit_uf(sigla_estado)
+        presente = pl.any_horizontal([(pl.col(str(ano)) & bit) != 0 for ano in self.anos_indexados])
+        return sorted(self.df.filter(presente)['Nome do candidato'].to_list())
+
+
+def _ler_cobertura():
+    try:
+        return json.loads(caminho_cobertura().read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _gravar(df, cobertura):
+    pasta = caminho_indice().parent
+    pasta.mkdir(parents=True, exist_ok=True)
+    temporario = pasta / f'.{uuid.uuid4().hex}'
+    df.write_parquet(temporario)
+    os.replace(temporario, caminho_indice())
+    # A cobertura é gravada depois do índice: reaplicar uma partição é idempotente
+    temporario.write_text(json.dumps(cobertura), encoding='utf-8')
+    os.replace(temporario, caminho_cobertura())
+
+
+def _ler_tabela():
+    if not caminho_indice().exists():
+        return _vazio()
+    df = pl.read_parquet(caminho_indice())
+    faltando = [pl.lit(0, dtype=pl.UInt32).alias(str(ano)) for ano in anos_disponiveis() if str(ano) not in df.columns]
+    return df.with_columns(faltando) if faltando else df
+
+
+def _nomes_particao(ano, sigla_estado):
+    """mtime do Parquet lido e nomes distintos da partição"""
+    consulta = scan_particao(ano, sigla_estado)
+    return caminho_particao(ano, sigla_estado).stat().st_mtime_ns, (
+        consulta
+        .select(pl.col('Nome do candidato').cast(pl.String))
+        .unique()
+        .with_columns(expr_normalizar_nome().alias('nome'))
+        .collect()
+    )
+
+
+def _aplicar_particao(df, ano, sigla_estado, nomes):
+    '''
+    Substituir o bit de (ano, UF) pelo conteúdo atual da partição.
+    O bit é zerado em todas as linhas antes, para que uma partição
+    reingerida também remova os nomes que saíram dela. Um ano ainda sem
+    coluna no índice ganha uma, zerada.
+    '''
+    bit = bit_uf(sigla_estado)
+    coluna = str(ano)
+    if coluna not in df.columns:
+        df = df.with_columns(pl.lit(0, dtype=pl.UInt32).alias(coluna))
+    colunas_anos = [str(a) for a in _anos_tabela(df)]
+    df = df.select('nome', 'Nome do candidato', *colunas_anos).with_columns(pl.col(coluna) & ~pl.lit(bit, dtype=pl.UInt32))
+    if nomes is not None and not nomes.is_empty():
+        novos = nomes.select(
+            'nome',
+            'Nome do candidato',
+            *[pl.lit(bit if a == coluna else 0, dtype=pl.UInt32).alias(a) for a in colunas_anos],
+        )
+        df = (
+            pl.concat([df, novos])
+            .group_by('nome')
+            .agg(pl.col('Nome do candidato').min(), *[pl.col(a).bitwise_or() for a in colunas_anos])
+        )
+    ativo = pl.any_horizontal([pl.col(a) != 0 for a in colunas_anos])
+    return df.filter(ativo).sort('nome')
+
+
+_trava = threading.Lock()
+_carregado = None
+
+
+def _pendente(cobertura, ano, sigla_estado):
+    '''
+    A partição ainda não entrou no índice ou mudou desde então.
+    Para partições presentes a cobertura guarda o mtime do Parquet usado;
+    uma reingestão (por exemplo depois de mudar a tabela de apelidos) muda o
+    mtime e a partição é reaplicada. Uma partição registrada como ausente
+    volta a ficar pendente quando o Parquet passa a existir (um ano novo
+    ingerido pela atualização incremental, por exemplo).
+    '''
+    valor = cobertura.get(f'{ano}-{sigla_estado}')
+    if valor is None:
+        return True
+    if valor == 'ausente':
+        return caminho_particao(ano, sigla_estado).exists()
+    if not particao_em_dia(ano, sigla_estado):
+        return True
+    return valor != caminho_particao(ano, sigla_estado).stat().st_mtime_ns
+
+
+def atualizar_indice(particoes, forcar=False):
+    '''
+    Incluir as partições (ano, UF) no índice persistido.
+    Partições já cobertas são ignoradas, a não ser com ``forcar``. Partições
+    sem arquivo de origem ficam registradas como ausentes. Download e
+    leitura acontecem fora da trava; ela só é tomada para juntar os nomes ao
+    índice e gravá-lo, então consultas ao índice não esperam por ingestões.
+    '''
+    with _trava:
+        cobertura = _ler_cobertura()
+    pendentes = [(ano, sigla.upper()) for ano, sigla in particoes if forcar or _pendente(cobertura, ano, sigla.upper())]
+    if not pendentes:
+        return
+
+    resultados, falhas = carregar_particoes(pendentes, _nomes_particao)
+    for erro in falhas.values():
+        if not isinstance(erro, FileNotFoundError):
+            raise erro
+
+    with _trava:
+        # Outra thread pode ter aplicado as mesmas partições, talvez numa versão mais nova
+        cobertura = _ler_cobertura()
+        df = _ler_tabela()
+        aplicadas = 0
+        for ano, sigla_estado in pendentes:
+            chave = f'{ano}-{sigla_estado}'
+            lido = resultados.get((ano, sigla_estado))
+            if lido is None:
+                if cobertura.get(chave) == 'ausente' and not forcar:
+                    continue
+                cobertura[chave] = 'ausente'
+                df = _aplicar_particao(df, ano, sigla_estado, None)
+            else:
+                mtime, nomes = lido
+                gravado = cobertura.get(chave)
+                if isinstance(gravado, int) and gravado >= mtime and not forcar:
+                    continue
+                cobertura[chave] = mtime
+                df = _aplicar_particao(df, ano, sigla_estado, nomes)
+            aplicadas += 1
+        if aplicadas:
+            _gravar(df, cobertura)
+
+
+def carregar_indice():
+    """Índice persistido, relido apenas quando o arquivo muda"""
+    global _carregado
+    caminho = caminho_indice()
+    versao = caminho.stat().st_mtime_ns if caminho.exists() else None
+    with _trava:
+        registrar_cache('presenca', acerto=_carregado is not None and _carregado[0] == versao)
+        if _carregado is None or _carregado[0] != versao:
+            with etapa('indice_presenca'):
+                _carregado = (versao, IndicePresenca(_ler_tabela()))
+        return _carregado[1]
+
+
+def indice_presenca(siglas=None, lista_anos=None):
+    """Índice cobrindo pelo menos as UFs e anos pedidos (todos os disponíveis por padrão)"""
+    atualizar_indice([
+        (ano, sigla_estado)
+        for ano in lista_anos or anos_disponiveis()
+        for sigla_estado in siglas or UFS
+    ])
+    return carregar_indice()
@@ -0,0 +1,122 @@
+"""
+Registro em memória das partições (ano, UF) carregadas.
+
+Cada partição é lida do Parquet uma única vez por processo e mantida com o
+esquema compacto. Projeções e filtros das páginas viram consultas lazy sobre
+o DataFrame em memória, então um mesmo arquivo não é mais lido e guardado
+uma vez por página ou por combinação de filtros. Quando o total passa do
+limite de bytes, as partições usadas há mais tempo são descartadas. Uma
+partição reingerida (por exemplo pela atualização incremental) tem outro
+mtime e é relida na próxima consulta.
+"""
+
+import threading
+from collections import OrderedDict
+
+from eleicoes.armazenamento import caminho_particao, scan_particao
+from eleicoes.coalescencia import Coalescedor
+from eleicoes.metricas import etapa, registrar_cache
+
+
+class RegistroParticoes:
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._particoes = OrderedDict()
+        self._trava = threading.Lock()
+        self._voos = Coalescedor('registro')
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    @staticmethod
+    def _chave(ano, sigla_estado):
+        return int(ano), sigla_estado.upper()
+
+    def __contains__(self, particao):
+        with self._trava:
+            return self._chave(*particao) in self._particoes
+
+    @staticmethod
+    def _versao(chave):
+        try:
+            return caminho_particao(*chave).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _em_memoria(self, chave):
+        versao = self._versao(chave)
+        with self._trava:
+            entrada = self._particoes.get(chave)
+            if entrada is not None and entrada[2] == versao:
+                self._particoes.move_to_end(chave)
+                return entrada[0]
+        return None
+
+    def obter(self, ano, sigla_estado):
+        '''
+        DataFrame completo da partição, carregando-o na primeira vez.
+        Sessões que pedem a mesma partição durante a carga esperam por ela.
+        '''
+        chave = self._chave(ano, sigla_estado)
+        df = self._em_memoria(chave)
+        if df is not None:
+            with self._trava:
+                self.acertos += 1
+            registrar_cache('registro', acerto=True)
+            return df
+        return self._voos.executar(chave, self._carregar, chave)
+
+    def _carregar(self, chave):
+        # Uma carga da mesma partição pode ter terminado depois da consulta em obter
+        df = self._em_memoria(chave)
+        if df is not None:
+            return df
+        with self._trava:
+            self.faltas += 1
+        registrar_cache('registro', acerto=False)
+
+        with etapa('leitura', ano=chave[0], uf=chave[1]) as medicao:
+            consulta = scan_particao(*chave)
+            # Lida depois da ingestão; se o arquivo mudar durante a leitura, a próxima consulta relê
+            versao = self._versao(chave)
+            df = consulta.collect()
+            medicao['linhas'] = df.height
+        with self._trava:
+            self._particoes[chave] = (df, df.estimated_size(), versao)
+            self._particoes.move_to_end(chave)
+            self._descartar(manter=chave)
+        return df
+
+    def scan(self, ano, sigla_estado):
+        """Consulta lazy sobre a partição em memória"""
+        return self.obter(ano, sigla_estado).lazy()
+
+    def _descartar(self, manter):
+        while self.bytes_em_uso() > self.limite_bytes:
+            chave = next(iter(self._particoes))
+            if chave == manter:
+                break
+            del self._particoes[chave]
+            self.descartes += 1
+
+    def bytes_em_uso(self):
+        return sum(tamanho for _, tamanho, _ in self._particoes.values())
+
+    def limpar(self):
+        with self._trava:
+            self._particoes.clear()
+
+    def estatisticas(self):
+        with self._trava:
+            total = self.acertos + self.faltas
+            return {
+                'particoes': len(self._particoes),
+                'bytes': self.bytes_em_uso(),
+                'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+                'cargas_compartilhadas': self._voos.compartilhadas,
+            }
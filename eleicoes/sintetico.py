@@ -0,0 +1,95 @@
+"""
+Gerador determinístico de arquivos de votação sintéticos.
+
+Produz CSV.gz com as mesmas colunas dos arquivos reais (``Nome do candidato``,
+``Votos``, ``Bairro``, ``Município``, ``Sigla do partido``, ``Cargo``) e os
+mesmos nomes de arquivo, então o diretório gerado pode ser usado direto como
+espelho local em ``ELEICOES_FONTE``. A mesma semente gera sempre os mesmos
+dados, o que permite comparar medições entre versões do código.
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+import polars as pl
+
+from eleicoes.constantes import anos, nome_arquivo
+
+# Ordem de grandeza de São Paulo
+LINHAS_SP = 3_000_000
+MUNICIPIOS_SP = 645
+
+PRENOMES = [
+    'ANA', 'ANTONIO', 'CARLOS', 'FRANCISCO', 'JOÃO', 'JOSÉ', 'LUCAS', 'LUIZ',
+    'MARCOS', 'MARIA', 'PAULO', 'PEDRO', 'RAFAEL', 'SANDRA', 'VERA', 'ZÉLIA',
+]
+SOBRENOMES = [
+    'ALVES', 'ARAÚJO', 'BARBOSA', 'CONCEIÇÃO', 'COSTA', 'DUARTE', 'FERREIRA', 'GOMES',
+    'LIMA', 'OLIVEIRA', 'PEREIRA', 'RIBEIRO', 'RODRIGUES', 'SANTOS', 'SILVA', 'SOUZA',
+]
+PARTIDOS = [
+    'AGIR', 'AVANTE', 'CIDADANIA', 'DC', 'MDB', 'NOVO', 'PCdoB', 'PDT', 'PL', 'PMB',
+    'PODE', 'PP', 'PRD', 'PSB', 'PSD', 'PSDB', 'PSOL', 'PT', 'PV', 'REDE', 'REPUBLICANOS',
+    'SOLIDARIEDADE', 'UNIÃO',
+]
+CARGOS_MUNICIPAIS = ['Vereador', 'Prefeito']
+CARGOS_GERAIS = ['Deputado Estadual', 'Deputado Federal', 'Senador', 'Governador', 'Presidente']
+
+
+def _sorteio(expr, semente, quantidade):
+    return (expr.hash(semente) % quantidade).cast(pl.Int64)
+
+
+def gerar_votos(ano, linhas=LINHAS_SP, municipios=MUNICIPIOS_SP, bairros_por_municipio=60, candidatos=None, semente=0):
+    '''
+    DataFrame sintético de um ano.
+    Em anos municipais cada candidato concorre num único município; nos
+    demais os votos se espalham pelo estado. O partido e o cargo são fixos
+    por candidato, como nos dados reais.
+    '''
+    candidatos = candidatos or max(linhas // 100, 10)
+    cargos = CARGOS_MUNICIPAIS if ano % 4 == 0 else CARGOS_GERAIS
+    semente = semente * 100_000 + ano * 10
+    linha = pl.int_range(linhas, dtype=pl.UInt64)
+    candidato = _sorteio(linha, semente + 1, candidatos)
+    municipio = (
+        _sorteio(candidato, semente + 2, municipios)
+        if ano % 4 == 0
+        else _sorteio(linha, semente + 2, municipios)
+    )
+    prenome = pl.lit(pl.Series(PRENOMES)).gather(candidato % len(PRENOMES))
+    sobrenome = pl.lit(pl.Series(SOBRENOMES)).gather((candidato // len(PRENOMES)) % len(SOBRENOMES))
+    cargo_candidato = pl.when(candidato % 50 == 0).then(1).otherwise(0) if ano % 4 == 0 else candidato % len(cargos)
+
+    return pl.select(
+        pl.format('{} {} {}', prenome, sobrenome, candidato).alias('Nome do candidato'),
+        _sorteio(linha, semente + 3, 2_000).alias('Votos'),
+        pl.format('BAIRRO {}', _sorteio(linha, semente + 4, bairros_por_municipio)).alias('Bairro'),
+        pl.format('MUNICÍPIO {}', municipio).alias('Município'),
+        pl.lit(pl.Series(PARTIDOS)).gather(_sorteio(candidato, semente + 5, len(PARTIDOS))).alias('Sigla do partido'),
+        pl.lit(pl.Series(cargos)).gather(cargo_candidato).alias('Cargo'),
+    )
+
+
+def gerar_espelho(diretorio, siglas=('SP',), lista_anos=None, linhas=LINHAS_SP, semente=0, **parametros):
+    """Gravar os CSV.gz sintéticos de cada (ano, UF) em ``diretorio``"""
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    for indice, sigla_estado in enumerate(siglas):
+        for ano in lista_anos or anos:
+            df = gerar_votos(ano, linhas=linhas, semente=semente + indice, **parametros)
+            # mtime=0 para que a mesma semente gere arquivos idênticos byte a byte
+            with open(diretorio / nome_arquivo(ano, sigla_estado), 'wb') as bruto:
+                with gzip.GzipFile(fileobj=bruto, mode='wb', mtime=0) as arquivo:
+                    df.write_csv(arquivo)
+    return diretorio
+
+
+if __name__ == '__main__':
+    # python -m eleicoes.sintetico DIRETORIO [LINHAS] [UF ...]
+    gerar_espelho(
+        sys.argv[1],
+        siglas=[s.upper() for s in sys.argv[3:]] or ('SP',),
+        linhas=int(sys.argv[2]) if len(sys.argv) > 2 else LINHAS_SP,
+    )
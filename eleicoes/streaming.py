@@ -0,0 +1,65 @@
+"""
+Modo streaming para as seleções grandes.
+
+Quando ligado, a consulta da página de geração fica lazy do começo ao fim:
+um ``scan_parquet`` por partição, filtros, ``concat`` lazy e o motor de
+streaming do polars. Só saem da consulta resultados pequenos (a soma e a
+contagem de ``resumir``, e a página visível da tabela com o resumo das
+colunas); as exportações continuam gravadas com ``sink_*`` direto da consulta.
+
+``ELEICOES_STREAMING=sim`` liga o modo sempre e ``nao`` desliga. No padrão
+``auto`` ele entra quando o tamanho estimado das partições selecionadas
+passa de ``ELEICOES_MEMORIA_MAX_BYTES``; a estimativa usa a contagem de
+linhas dos metadados do Parquet, sem ler os dados.
+"""
+
+import polars as pl
+
+from eleicoes.armazenamento import ingerir_particao, scan_particao
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.configuracao import limite_memoria, modo_streaming
+from eleicoes.consultas import filtrar_votos
+
+# Bytes por linha no esquema compacto (5 categorias + Votos em 4 bytes cada)
+BYTES_POR_LINHA = 24
+
+
+def linhas_particao(ano, sigla_estado):
+    return pl.scan_parquet(ingerir_particao(ano, sigla_estado)).select(pl.len()).collect().item()
+
+
+def bytes_estimados(particoes):
+    """Memória estimada das partições carregadas por inteiro; as que não existem não contam"""
+    linhas, _ = carregar_particoes(particoes, linhas_particao)
+    return sum(linhas.values()) * BYTES_POR_LINHA
+
+
+def usar_streaming(particoes):
+    modo = modo_streaming()
+    if modo in ('sim', 'nao'):
+        return modo == 'sim'
+    return bytes_estimados(particoes) > limite_memoria()
+
+
+def scan_votos(particoes, **filtros):
+    '''
+    Consulta lazy com os filtros aplicados a todas as partições.
+    Retorna ``(consulta, falhas)``; partições sem arquivo ficam em ``falhas``.
+    '''
+    scans, falhas = carregar_particoes(particoes, scan_particao)
+    if not scans:
+        raise FileNotFoundError('Nenhum arquivo encontrado para os anos e UFs selecionados')
+    consulta = pl.concat([
+        filtrar_votos(df, ano, sigla_estado, **filtros)
+        for (ano, sigla_estado), df in scans.items()
+    ])
+    return consulta, falhas
+
+
+def resumir(consulta):
+    """Quantidade de linhas e soma dos votos, calculadas em streaming"""
+    linhas, votos = consulta.select(
+        pl.len(),
+        pl.col('Votos').cast(pl.Int64).sum(),
+    ).collect(engine='streaming').row(0)
+    return {'linhas': linhas, 'votos': votos}
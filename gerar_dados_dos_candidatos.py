@@ -1,202 +1,149 @@
 import streamlit as st
-from requests.utils import quote
-from io import BytesIO
 import polars as pl
+from functools import partial
+from eleicoes.armazenamento import anos_disponiveis
+from eleicoes.atualizacao import versao_dados
+from eleicoes.constantes import estados
+from eleicoes.carregamento import carregar_particoes
+from eleicoes.catalogo import opcoes
+from eleicoes.consultas import filtrar_votos, nome_exportacao, opcoes_filtros
+from eleicoes.exportacao import FORMATOS, arquivo_para_download
+from eleicoes.paginas import antecipar, cache_data, painel_metricas, registro, tabela_paginada
+from eleicoes.streaming import resumir, scan_votos, usar_streaming
 
 st.set_page_config(layout='wide')
 st.title('Gerar dados dos Candidatos')
 st.info('Ferramenta para gerar dados a partir dos filtro selecionados')
+painel_metricas()
 col1, col2 = st.columns([1, 1])
 col11, col22, col33, col44 = st.columns([1, 1, 1, 1])
 col111, col222 = st.columns([2, 1])
 
 
-estados = {
-        'AC': 'Acre',
-        'AL': 'Alagoas',
-        'AP': 'Amapá',
-        'AM': 'Amazonas',
-        'BA': 'Bahia',
-        'CE': 'Ceará',
-        'DF': 'Distrito Federal',
-        'ES': 'Espírito Santo',
-        'GO': 'Goiás',
-        'MA': 'Maranhão',
-        'MT': 'Mato Grosso',
-        'MS': 'Mato Grosso do Sul',
-        'MG': 'Minas Gerais',
-        'PA': 'Pará',
-        'PB': 'Paraiba',
-        'PR': 'Paraná',
-        'PE': 'Pernambuco',
-        'PI': 'Piauí',
-        'RJ': 'Rio de Janeiro',
-        'RN': 'Rio Grande do Norte',
-        'RS': 'Rio Grande do Sul',
-        'RO': 'Rondônia',
-        'RR': 'Roraima',
-        'SC': 'Santa Catarina',
-        'SP': 'São Paulo',
-        'SE': 'Sergipe',
-        'TO': 'Tocantins'
-}
-
-
-@st.cache_data
-def load_data(ano, sigla_estado, bairro: list ='', municipio: list ='', candidato: list ='', partido: list ='', columns=''):
-    
-    link = f'https://raw.githubusercontent.com/HugoCDM/candidatos/main/Elei%C3%A7%C3%B5es%20{ano}%20-%20{quote(estados[sigla_estado.upper()])}.csv.gz'
-    df = pl.scan_csv(link)
-
-    if columns:
-        df = df.select(columns)
-
-    # df['Ano'] = ano
-    df = df.with_columns(pl.lit(ano).alias('Ano'))
-
-    if bairro:
-        df = df.filter(pl.col('Bairro').is_in(bairro))
-
-    if partido:
-        df = df.filter(pl.col('Sigla do partido').is_in(partido))
-
-    if candidato:
-        df = df.filter(pl.col('Nome do candidato').is_in(candidato))
-
-    if municipio:
-        df = df.filter(pl.col('Município').is_in(municipio))
-
-    return df.collect()
+def scan_data(ano, sigla_estado, bairro: list ='', municipio: list ='', candidato: list ='', partido: list ='', columns=''):
+    return filtrar_votos(registro().scan(ano, sigla_estado), ano, sigla_estado, bairro, municipio, candidato, partido, columns)
 
 
-@st.cache_data
-def generate_filename(ano, sigla_estado, bairro='', municipio='', candidato='', partido=''):
-    params = []
+def consultar(particoes, filtros):
+    """Consulta lazy com os filtros sobre as partições já carregadas no registro"""
+    return pl.concat([scan_data(ano, sigla_estado, **filtros) for ano, sigla_estado in particoes])
 
-    if ano:
-        ano_list = ' e '.join(ano)
-
-    if bairro:
-        params.append(' e '.join(bairro))
-
-    if municipio:
-        params.append(' e '.join(municipio))
-
-    if candidato:
-        params.append(' e '.join(candidato))
-
-    if partido:
-        params.append('(' + ' e '.join(partido) + ')')
-    
-    filename = f'ELEIÇÕES {ano_list} {sigla_estado}'
-    if params:
-        filename += ' ' + f"{' - '.join(params)}"
-    filename += '.xlsx'
 
-    return filename
+@cache_data
+def generate_filename(ano, sigla_estado, bairro='', municipio='', candidato='', partido='', extensao='xlsx'):
+    return nome_exportacao(ano, sigla_estado, bairro, municipio, candidato, partido, extensao)
 
 
-@st.cache_data
-def generate_excel(df):
-    buffer = BytesIO()    
-    df.write_excel(buffer)
-    buffer.seek(0)  
-    return buffer   
+@cache_data
+def load_filter_options(anos_select, siglas_estado, versao):
+    # ``versao`` só compõe a chave do cache: muda quando a atualização incremental refaz os catálogos
+    return opcoes_filtros(anos_select, siglas_estado)
 
 
-@st.cache_data
-def load_filter_options(anos_select, sigla_estado):
-    try:
-        bairros_municipios = []
-        for ano in anos_select:
-            df_bairros_municipios = load_data(ano, sigla_estado, columns=['Bairro', 'Município', 'Sigla do partido', 'Nome do candidato'])
-            df_bairros_municipios = df_bairros_municipios.select(pl.col(['Bairro', 'Município', 'Sigla do partido', 'Nome do candidato']))
-            # df_bairros_municipios = df_bairros_municipios[['Bairro', 'Município']]
-            # print(df_bairros_municipios)
-            bairros_municipios.append(df_bairros_municipios)
-            
-        bairros_municipios_df = pl.concat(bairros_municipios)   
 
-        bairros = sorted(bairros_municipios_df.select(pl.col('Bairro')).unique().to_series())
-        municipios = sorted(bairros_municipios_df.select(pl.col('Município')).unique().to_series())
-        partidos = sorted(bairros_municipios_df.select(pl.col('Sigla do partido')).unique().to_series())
-        candidatos = sorted(bairros_municipios_df.select(pl.col('Nome do candidato')).unique().to_series())
-
-        return bairros, municipios, partidos, candidatos
-    except:
-        return
-
-
-
-anos = [str(i) for i in range(2024, 2015, -2)]
+anos = [str(ano) for ano in reversed(anos_disponiveis())]
 
 # ano = st.text_input('Ano', placeholder='ex.: 2020 ou 2020, 2022')
 anos_select = col1.multiselect('Ano*', options=anos, placeholder='Selecione o(s) ano(s)')
 # sigla_estado = st.text_input('Sigla do Estado', placeholder='ex.: RJ')
-sigla_estado = col2.selectbox('Sigla da Unidade Federativa (UF)*', options=estados.keys(), placeholder='Selecione a(s) unidade(s) federativa(s)', index=list(estados.keys()).index('RJ'))
+siglas_estado = col2.multiselect('Sigla da Unidade Federativa (UF)*', options=estados.keys(), placeholder='Selecione a(s) unidade(s) federativa(s)', default=['RJ'])
+antecipar(siglas_estado)
 
 try:
-    bairros, municipios, partidos, candidatos = load_filter_options(anos_select, sigla_estado)
+    catalogo = load_filter_options(anos_select, siglas_estado, versao_dados())
     bairro_input = municipio_input = candidato_input = partido_input = ''
-    bairro = col11.checkbox('Bairro(s)')
-    if bairro:
-        bairro_input = col11.multiselect('Bairro', placeholder='Selecione o(s) bairro(s)', options=bairros, label_visibility='collapsed')
 
+    # Município e partido vêm antes para estreitar as opções de bairro e candidato
     municipio = col22.checkbox('Município(s)')
     if municipio:
-        municipio_input = col22.multiselect('Município(s)', placeholder='Selecione o(s) município(s)', options=municipios, label_visibility='collapsed')
+        municipio_input = col22.multiselect('Município(s)', placeholder='Selecione o(s) município(s)', options=opcoes(catalogo['locais'], 'Município'), label_visibility='collapsed')
 
-    candidato = col33.checkbox('Candidato(s)')
-    if candidato:
-        candidato_input = col33.multiselect('Candidato(s)', placeholder='Selecione o(s) candidato(s)', options=candidatos, label_visibility='collapsed')
+    bairro = col11.checkbox('Bairro(s)')
+    if bairro:
+        bairro_input = col11.multiselect('Bairro', placeholder='Selecione o(s) bairro(s)', options=opcoes(catalogo['locais'], 'Bairro', {'Município': municipio_input}), label_visibility='collapsed')
 
     partido = col44.checkbox('Partido(s)')
     if partido:
-        partido_input = col44.multiselect('Partido(s)', placeholder='Selecione o(s) partido(s)', options=partidos, label_visibility='collapsed')
+        partido_input = col44.multiselect('Partido(s)', placeholder='Selecione o(s) partido(s)', options=opcoes(catalogo['candidaturas'], 'Sigla do partido'), label_visibility='collapsed')
+
+    candidato = col33.checkbox('Candidato(s)')
+    if candidato:
+        candidato_input = col33.multiselect('Candidato(s)', placeholder='Selecione o(s) candidato(s)', options=opcoes(catalogo['candidaturas'], 'Nome do candidato', {'Sigla do partido': partido_input}), label_visibility='collapsed')
 except:
     pass
 
 
 if col111.button('Carregar dados'):
-    if not anos_select or not sigla_estado:
+    if not anos_select or not siglas_estado:
         st.warning('Preencha todos os campos obrigatórios (Ano e Sigla do Estado)')
+        st.session_state.pop('selecao', None)
     else:
+        anos_select = sorted(anos_select)
+        particoes = [(ano, sigla_estado) for ano in anos_select for sigla_estado in siglas_estado]
+        filtros = dict(bairro=bairro_input, municipio=municipio_input, candidato=candidato_input, partido=partido_input)
         with st.spinner('Carregando dados!'):
             try:
-                dfs = []
-                anos_select = sorted(anos_select)
-                for ano in anos_select:
-                    df = load_data(ano, sigla_estado, bairro=bairro_input, municipio=municipio_input, candidato=candidato_input, partido=partido_input)
-                    dfs.append(df)
-                    
-                filename = generate_filename(anos_select, sigla_estado, bairro=bairro_input, municipio=municipio_input, candidato=candidato_input, partido=partido_input)
-                new_df = pl.concat(dfs)
-                
-                
-                st.dataframe(new_df, hide_index=True, use_container_width=True)
-
-                # votes_sum = new_df['Votos'].sum()
-                votes_sum = new_df.select(pl.sum('Votos')).item()
-                col222.success(f'A quantidade total de votos foi: {votes_sum:,}'.replace(',', '.'))
-                with st.spinner('Carregando botão para Download'):
-                    buffer = generate_excel(new_df)
-                    st.download_button(
-                        label='Baixar os dados como Excel',
-                        data=buffer,
-                        file_name=filename,
-                        mime='application/vnd.ms-excel'
-                        )
-                
-        
+                streaming = usar_streaming(particoes)
+                if streaming:
+                    # Seleção grande: nada é materializado além da soma e das páginas exibidas
+                    consulta, falhas = scan_votos(particoes, **filtros)
+                else:
+                    resultados, falhas = carregar_particoes(particoes, registro().obter)
+                    if not resultados:
+                        # Nenhuma partição carregou: mostrar o motivo de cada uma
+                        for (ano, sigla_estado), erro in falhas.items():
+                            st.warning(f'{estados[sigla_estado]} não carregado nas eleições de {ano}: {erro}')
+                        st.session_state.pop('selecao', None)
+                        st.stop()
+                    particoes = list(resultados)
+                    consulta = consultar(particoes, filtros)
+                # A seleção fica na sessão para que a paginação sobreviva às próximas execuções
+                st.session_state['selecao'] = {
+                    'anos': anos_select,
+                    'siglas': list(siglas_estado),
+                    'particoes': particoes,
+                    'filtros': filtros,
+                    'streaming': streaming,
+                    'falhas': {particao: str(erro) for particao, erro in falhas.items()},
+                }
             except Exception as e:
+                st.session_state.pop('selecao', None)
                 st.error(f'Error ao carregar os dados. {e}')
 
-      
-        
-
-        
 
-        
-        
+selecao = st.session_state.get('selecao')
+if selecao:
+    for (ano, sigla_estado), erro in selecao['falhas'].items():
+        st.warning(f'{estados[sigla_estado]} não carregado nas eleições de {ano}: {erro}')
 
-    
+    if selecao['streaming']:
+        consulta, _ = scan_votos(selecao['particoes'], **selecao['filtros'])
+    else:
+        consulta = consultar(selecao['particoes'], selecao['filtros'])
+
+    # Total de votos e de linhas numa passada própria em streaming, antes dos filtros da tabela
+    assinatura = (repr(selecao), versao_dados())
+    total = st.session_state.get('resultado_total')
+    if total is None or total[0] != assinatura:
+        total = st.session_state['resultado_total'] = (assinatura, resumir(consulta))
+    linhas, votes_sum = total[1]['linhas'], total[1]['votos'] or 0
+    col222.success(f'A quantidade total de votos foi: {votes_sum:,}'.replace(',', '.'))
+    legenda = f'{linhas:,} linhas'.replace(',', '.')
+    if selecao['streaming']:
+        col222.caption(f'Modo streaming: {legenda}, cada página é lida do disco sob demanda')
+    else:
+        memoria = sum(registro().obter(ano, sigla_estado).estimated_size('mb') for ano, sigla_estado in selecao['particoes'])
+        col222.caption(f'{legenda} em memória')
+        col222.caption(f'Memória ocupada pelos dados: {memoria:,.1f} MB')
+
+    tabela_paginada(consulta, 'resultado', assinatura, streaming=selecao['streaming'])
+
+    for coluna, (formato, (descricao, mime)) in zip(st.columns(len(FORMATOS)), FORMATOS.items()):
+        filename = generate_filename(selecao['anos'], ' e '.join(selecao['siglas']), extensao=formato, **selecao['filtros'])
+        coluna.download_button(
+            label=f'Baixar os dados como {descricao}',
+            data=partial(arquivo_para_download, consulta, formato),
+            file_name=filename,
+            mime=mime,
+            on_click='ignore'
+            )
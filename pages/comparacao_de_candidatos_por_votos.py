@@ -1,70 +1,74 @@
 import streamlit as st
-from gerar_dados_dos_candidatos import estados
-from requests.utils import quote
-import pandas as pd
+from eleicoes.constantes import estados
+from eleicoes.agregados import agregado_por_candidato
+from eleicoes.armazenamento import anos_disponiveis
+from eleicoes.atualizacao import versao_dados
+from eleicoes.consultas import comparar_candidatos
+from eleicoes.metricas import etapa
+from eleicoes.paginas import antecipar, cache_data, painel_metricas
 import polars as pl
-import plotly.express as px
 
 st.set_page_config(layout='wide')
 st.title('Comparação de Candidatos por Votos')
 st.info('Ferramenta para comparar candidatos por votos em diferentes eleições através de gráficos.')
+painel_metricas()
 
-def normalize_data(df):
-    """Normaliza nomes e cargos no dataframe"""
-    return df.with_columns([
-        pl.col('Nome do candidato').str.replace('PEDRO DUARTE JR', 'PEDRO DUARTE'),
-        pl.col('Cargo').str.to_uppercase()
-    ])
-
-@st.cache_data
-def read_csv(ano, sigla_estado):
+@cache_data
+def read_candidatos(ano, sigla_estado, versao):
+    # ``versao`` só compõe a chave do cache: muda quando a atualização incremental refaz os agregados
     try:
-        url = f'https://raw.githubusercontent.com/HugoCDM/candidatos/main/Elei%C3%A7%C3%B5es%20{ano}%20-%20{quote(estados[sigla_estado.upper()])}.csv.gz'
-        df = pd.read_csv(url)
-        df['Ano'] = ano
-        return df
+        with st.spinner('Carregando candidatos...'):
+            df = agregado_por_candidato(sigla_estado, 'candidato').df
+        candidatos = df.filter(pl.col('Ano') == ano)['Nome do candidato'].unique(maintain_order=True).to_list()
+        if not candidatos:
+            raise FileNotFoundError
+        return candidatos
     except:
         st.warning(f'{estados[sigla_estado.upper()]} não encontrado nas eleições de {ano}')
-        return 
+        return
+
+
+def fatias_candidatos(ano, sigla_estado, nome, candidatos):
+    # Linhas de cada candidato escolhido, sem varrer o agregado da UF inteira
+    indice = agregado_por_candidato(sigla_estado, nome)
+    fatias = [indice.fatia(candidato) for candidato in candidatos] or [indice.df.clear()]
+    return pl.concat(fatias).lazy().filter(pl.col('Ano') == ano)
 
-@st.cache_data
-def read_csv_cached(ano, sigla_estado):
-    with st.spinner('Carregando candidatos...'):
-        return read_csv(ano, sigla_estado)
-    
 
 col1, col2, col3 = st.columns([1, 1, 1])
 con1 = st.container()
 col11, col22 = st.columns([1,1])
-ano = col1.selectbox('Selecione o Ano da Eleição', [2024, 2022, 2020, 2018, 2016])
+ano = col1.selectbox('Selecione o Ano da Eleição', list(reversed(anos_disponiveis())))
 sigla_estado = col2.selectbox('Selecione a Sigla do Estado', options=list(estados.keys()), index=list(estados.keys()).index('RJ'))
-df = read_csv_cached(ano, sigla_estado)
+antecipar([sigla_estado], 'agregados')
+candidatos_urna = read_candidatos(ano, sigla_estado, versao_dados())
+
+if candidatos_urna:
+    import plotly.express as px
 
-if isinstance(df, pd.DataFrame):
-    candidatos_urna = df['Nome do candidato'].unique()
     candidatos = col3.multiselect('Candidatos para comparação', candidatos_urna, placeholder='Candidatos')
-    df_candidates = df[df['Nome do candidato'].isin(candidatos)]
-    df_chart = df_candidates.groupby('Nome do candidato')['Votos'].sum().reset_index()
+    # As três tabelas saem de uma única execução sobre as fatias dos candidatos escolhidos
+    with etapa('groupby', uf=sigla_estado, ano=ano):
+        df_chart, df_neighborhood, df_top_10_parties = comparar_candidatos(
+            *(fatias_candidatos(ano, sigla_estado, nome, candidatos) for nome in ('candidato', 'candidato_bairro', 'candidato_municipio')),
+            candidatos,
+        )
     
-    df_chart_plotly = px.bar(df_chart, y='Nome do candidato', x='Votos', text_auto=True, text='Votos', orientation='h', title='Votos gerais por candidato')
-    df_chart_plotly.update_traces(texttemplate='%{text:,.0f}')
+    with etapa('plotly', grafico='votos'):
+        df_chart_plotly = px.bar(df_chart, y='Nome do candidato', x='Votos', text_auto=True, text='Votos', orientation='h', title='Votos gerais por candidato')
+        df_chart_plotly.update_traces(texttemplate='%{text:,.0f}')
     col11.plotly_chart(df_chart_plotly)
 
-    df_neighborhood = df_candidates.groupby(['Nome do candidato', 'Bairro'])['Votos'].sum().reset_index().sort_values(by='Votos', ascending=False).head(10)
-    df_neighborhood_plotly = px.bar(df_neighborhood, y='Nome do candidato', x='Votos', color='Bairro', text_auto=True, text='Votos', orientation='h', title='10 Bairros mais votados')
+    with etapa('plotly', grafico='bairros'):
+        df_neighborhood_plotly = px.bar(df_neighborhood, y='Nome do candidato', x='Votos', color='Bairro', text_auto=True, text='Votos', orientation='h', title='10 Bairros mais votados')
     col22.plotly_chart(df_neighborhood_plotly)
 
     # Partido vs Partido (partido por municipio x bairro) - heatmap
 
-    df_parties = df_candidates.groupby(['Sigla do partido', 'Município'])['Votos'].sum().reset_index()
-    top_10_parties = df_parties.groupby('Sigla do partido', as_index=False)['Votos'].sum().nlargest(10, 'Votos')['Sigla do partido']
-    top_10_municipiums = df_parties.groupby('Município', as_index=False)['Votos'].sum().nlargest(10, 'Votos')['Município']
-    df_top_10_parties = df_parties[(df_parties['Sigla do partido'].isin(top_10_parties)) & (df_parties['Município'].isin(top_10_municipiums))]
-
-    print(df_parties)
-    df_parties_heatmap = px.density_heatmap(df_top_10_parties, x='Município', y='Sigla do partido', z='Votos', color_continuous_scale='Reds')
+    with etapa('plotly', grafico='partidos'):
+        df_parties_heatmap = px.density_heatmap(df_top_10_parties, x='Município', y='Sigla do partido', z='Votos', color_continuous_scale='Reds')
 
-    df_line = px.ecdf(df_top_10_parties, x='Votos', color='Sigla do partido')
+        df_line = px.ecdf(df_top_10_parties, x='Votos', color='Sigla do partido')
     st.plotly_chart(df_parties_heatmap)
 
 